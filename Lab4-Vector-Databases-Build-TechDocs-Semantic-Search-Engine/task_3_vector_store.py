@@ -5,7 +5,9 @@ Create a production-ready vector database using LangChain and ChromaDB.
 """
 
 import os
+import sys
 import tempfile
+from pathlib import Path
 from typing import List
 
 # TODO 1: Import Chroma vector store
@@ -15,24 +17,24 @@ from langchain_community.vectorstores import Chroma
 # TODO 2: Import HuggingFace embeddings
 # Replace ___ with: HuggingFaceEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
-a
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
+# Shared embedding tools live with the RAG lab; without them we embed directly
+sys.path.append(str(Path(__file__).resolve().parent.parent / "Lab5-The-RAG-Revolution"))
+try:
+    from embedding_cache import CachedEmbeddings
+    from embedding_pool import EmbeddingPool, PooledEmbeddings
+    from onnx_encoder import EMBEDDING_BACKEND, export_quantized_model, onnx_model_kwargs, encoder_cache_name
+except ImportError:
+    CachedEmbeddings = None
+    EmbeddingPool = None
+    EMBEDDING_BACKEND = "torch"
+
 def main():
     print("🗄️ Task 3: Building Vector Store with ChromaDB")
     print("=" * 55)
 
-    # TODO 3: Initialize embeddings
-    # Replace ___ with: "all-MiniLM-L6-v2"
-    embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
-
-    print("✅ Embedding model loaded")
-
     # Sample TechDocs documents
     documents_text = [
         """Remote Work Policy: Employees can work from home up to 3 days per week.
@@ -51,6 +53,40 @@ def main():
         Client meetings require business formal. Work from home has no dress requirements."""
     ]
 
+    # EMBED_WORKERS=N shards embedding across N worker processes; "auto" calibrates
+    # workers x threads x batch size on the sample documents first
+    embed_workers = os.getenv("EMBED_WORKERS", "1")
+    if EmbeddingPool is not None and not (embed_workers == "auto" or embed_workers.isdigit()):
+        print(f"⚠️ Ignoring EMBED_WORKERS={embed_workers!r} (expected a number or \"auto\")")
+        embed_workers = "1"
+    if EmbeddingPool is not None and embed_workers == "auto":
+        print("⚙️ Calibrating embedding pool...")
+        embeddings = PooledEmbeddings(
+            EmbeddingPool.autotune("all-MiniLM-L6-v2", documents_text * 64), normalize=True
+        )
+    elif EmbeddingPool is not None and int(embed_workers) > 1:
+        embeddings = PooledEmbeddings(EmbeddingPool("all-MiniLM-L6-v2", workers=int(embed_workers)), normalize=True)
+    else:
+        # TODO 3: Initialize embeddings
+        # Replace ___ with: "all-MiniLM-L6-v2"
+        model_name, model_kwargs = "all-MiniLM-L6-v2", {'device': 'cpu'}
+
+        # EMBEDDING_BACKEND=onnx-int8 loads the quantized ONNX export of the same model instead
+        if EMBEDDING_BACKEND == "onnx-int8":
+            model_name, model_kwargs = export_quantized_model("all-MiniLM-L6-v2"), onnx_model_kwargs()
+
+        embeddings = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs={'normalize_embeddings': True}
+        )
+
+    # Reuse vectors for text embedded by earlier runs (EMBEDDING_CACHE=0 disables it)
+    if CachedEmbeddings is not None and os.getenv("EMBEDDING_CACHE", "1") == "1":
+        embeddings = CachedEmbeddings(embeddings, encoder_cache_name("all-MiniLM-L6-v2"), normalize=True)
+
+    print("✅ Embedding model loaded")
+
     # Convert to Document objects with metadata
     documents = []
     for i, text in enumerate(documents_text):
@@ -5,23 +5,43 @@ Build a complete semantic search system that understands meaning!
 """
 
 import os
+import sys
 import tempfile
+from pathlib import Path
 from typing import List
 from langchain_community.vectorstores import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.schema import Document
 
+# Shared embedding tools live with the RAG lab; without them we embed directly
+sys.path.append(str(Path(__file__).resolve().parent.parent / "Lab5-The-RAG-Revolution"))
+try:
+    from embedding_cache import CachedEmbeddings
+    from onnx_encoder import EMBEDDING_BACKEND, export_quantized_model, onnx_model_kwargs, encoder_cache_name
+except ImportError:
+    CachedEmbeddings = None
+    EMBEDDING_BACKEND = "torch"
+
 def build_search_engine():
     print("🔍 Task 4: Semantic Search Implementation")
     print("=" * 55)
 
+    # EMBEDDING_BACKEND=onnx-int8 loads the quantized ONNX export of the same model instead
+    model_name, model_kwargs = "all-MiniLM-L6-v2", {'device': 'cpu'}
+    if EMBEDDING_BACKEND == "onnx-int8":
+        model_name, model_kwargs = export_quantized_model("all-MiniLM-L6-v2"), onnx_model_kwargs()
+
     # Initialize embeddings
     embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},
+        model_name=model_name,
+        model_kwargs=model_kwargs,
         encode_kwargs={'normalize_embeddings': True}
     )
 
+    # Reuse vectors for text embedded by earlier runs (EMBEDDING_CACHE=0 disables it)
+    if CachedEmbeddings is not None and os.getenv("EMBEDDING_CACHE", "1") == "1":
+        embeddings = CachedEmbeddings(embeddings, encoder_cache_name("all-MiniLM-L6-v2"), normalize=True)
+
     # TechDocs complete knowledge base
     knowledge_base = [
         "Remote work policy allows employees to work from home up to 3 days per week with manager approval.",
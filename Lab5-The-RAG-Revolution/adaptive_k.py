@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Adaptive number of retrieved chunks
+Cuts an over-fetched, best-first hit list where its similarity scores say the relevant part ends
+"""
+
+from confidence_gate import distance_to_similarity
+
+
+class AdaptiveCutoff:
+    """
+    Chooses how many of the best hits to keep, between min_k and max_k.
+
+    mode "gap": cut after the hit followed by the largest similarity drop,
+    if that drop is at least min_gap; a flat score list keeps default_k.
+    mode "cumulative": keep the fewest hits whose share of the candidates'
+    total similarity reaches `threshold`.
+    """
+
+    def __init__(self, mode="gap", min_k=1, max_k=5, default_k=3, min_gap=0.05, threshold=0.6, space="l2"):
+        if mode not in ("gap", "cumulative"):
+            raise ValueError(f"unknown adaptive k mode {mode!r}")
+        self.mode = mode
+        self.min_k = min_k
+        self.max_k = max_k
+        self.default_k = min(max(default_k, min_k), max_k)
+        self.min_gap = min_gap
+        self.threshold = threshold
+        self.space = space
+        self.chosen = {}  # k -> number of questions
+
+    def choose(self, distances):
+        """Returns (k, reason) for one question's best-first distances"""
+        similarities = [distance_to_similarity(d, self.space) for d in distances[:self.max_k]]
+        if len(similarities) <= self.min_k:
+            k, reason = len(similarities), "few candidates"
+        elif self.mode == "gap":
+            k, reason = self._largest_gap(similarities)
+        else:
+            k, reason = self._cumulative(similarities)
+
+        self.chosen[k] = self.chosen.get(k, 0) + 1
+        return k, reason
+
+    def _largest_gap(self, similarities):
+        gaps = [
+            (similarities[i - 1] - similarities[i], i)
+            for i in range(self.min_k, len(similarities))
+        ]
+        gap, k = max(gaps)
+        if gap < self.min_gap:
+            k = min(self.default_k, len(similarities))
+            return k, f"flat scores (largest gap {gap:.3f} < {self.min_gap})"
+        return k, f"largest gap {gap:.3f} after hit {k}"
+
+    def _cumulative(self, similarities):
+        weights = [max(s, 0.0) for s in similarities]
+        total = sum(weights)
+        if total <= 0:
+            return self.min_k, "no positive similarity"
+
+        running = 0.0
+        for k, weight in enumerate(weights, 1):
+            running += weight
+            if k >= self.min_k and running / total >= self.threshold:
+                return k, f"{running / total:.0%} of similarity mass in {k} hits"
+        return len(weights), "similarity mass spread over every candidate"
+
+    def stats(self):
+        questions = sum(self.chosen.values())
+        return {
+            "questions": questions,
+            "mean_k": sum(k * n for k, n in self.chosen.items()) / questions if questions else 0.0,
+            "chosen": dict(sorted(self.chosen.items()))
+        }
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Semantic answer cache
+Reuses a generated answer for a reworded question that retrieves the same chunks
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from ingest_manifest import MANIFEST_PATH, load_manifest, chunk_hashes
+
+
+class ChunkVersions:
+    """
+    Current sha256 of every chunk id, read from the ingestion manifest and
+    reloaded whenever Task 2 (or its watch mode) rewrites it.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self._mtime = None
+        self._hashes = {}
+
+    def current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+
+        if mtime != self._mtime:
+            self._hashes = chunk_hashes(load_manifest(self.path)) if mtime is not None else {}
+            self._mtime = mtime
+        return self._hashes
+
+
+class SemanticAnswerCache:
+    """
+    In-memory cache of (question embedding, retrieved chunk ids, answer).
+
+    A lookup hits when a cached question has cosine similarity of at least
+    min_similarity to the new one and both retrieved the same chunk ids.
+    Entries expire after ttl seconds, the least recently used entry is
+    evicted beyond max_entries, and an entry is dropped as soon as any of
+    its chunks was re-ingested with different text.
+    """
+
+    def __init__(self, min_similarity=0.92, ttl=86400, max_entries=1000, dim=384, versions=None):
+        self.min_similarity = min_similarity
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.versions = versions if versions is not None else ChunkVersions()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        # One row per entry; unused rows are zero so they never reach the threshold
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries = OrderedDict()  # row -> entry, least recently used first
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, row):
+        del self._entries[row]
+        self._vectors[row] = 0.0
+        self._free_rows.append(row)
+
+    def _is_current(self, entry, versions):
+        return all(versions.get(cid) == text_hash for cid, text_hash in entry["chunks"].items())
+
+    def lookup(self, query_embedding, chunk_ids):
+        """Cached answer for a question embedding and its retrieved chunk ids, or None"""
+        query = self._unit(query_embedding)
+        wanted = frozenset(chunk_ids)
+        versions = self.versions.current()
+        now = time.monotonic()
+
+        with self._lock:
+            similarities = self._vectors @ query
+            candidates = np.flatnonzero(similarities >= self.min_similarity)
+            for row in candidates[np.argsort(-similarities[candidates])]:
+                entry = self._entries.get(int(row))
+                if entry is None:
+                    continue
+                if now - entry["created"] > self.ttl:
+                    self._drop(int(row))
+                    self.evictions += 1
+                    continue
+                if not self._is_current(entry, versions):
+                    self._drop(int(row))
+                    self.invalidations += 1
+                    continue
+                if entry["chunk_ids"] == wanted:
+                    self._entries.move_to_end(int(row))
+                    self.hits += 1
+                    return entry["answer"]
+
+            self.misses += 1
+            return None
+
+    def store(self, query_embedding, chunk_ids, answer):
+        """Cache an answer together with the chunk versions it was generated from"""
+        versions = self.versions.current()
+        entry = {
+            "chunk_ids": frozenset(chunk_ids),
+            "chunks": {cid: versions.get(cid) for cid in chunk_ids},
+            "answer": answer,
+            "created": time.monotonic()
+        }
+
+        with self._lock:
+            if not self._free_rows:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+            row = self._free_rows.pop()
+            self._vectors[row] = self._unit(query_embedding)
+            self._entries[row] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
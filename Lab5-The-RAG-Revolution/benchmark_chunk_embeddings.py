@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-chunk encoding vs paragraph-embedding reuse
+Compares ingestion time and retrieval quality of the two Task 2 embedding modes
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from chunking import smart_chunk_document, smart_chunk_parts
+from paragraph_embeddings import compose_chunk_embeddings
+
+TEST_QUESTIONS = [
+    "Can I bring my dog to the office?",
+    "How many vacation days do I get?",
+    "What is the remote work policy?",
+    "How do I reset my password?",
+    "Is VPN required when working from home?",
+    "What does the health insurance cover?"
+]
+
+
+def load_corpus(doc_dir):
+    """All chunks and their paragraph layouts under doc_dir"""
+    chunks, layouts = [], []
+    for doc_file in sorted(doc_dir.glob("*/*.md")):
+        with open(doc_file, "r") as f:
+            content = f.read()
+        chunks.extend(smart_chunk_document(content))
+        layouts.extend(smart_chunk_parts(content))
+    return chunks, layouts
+
+
+def top_k(query_embeddings, chunk_embeddings, k):
+    scores = query_embeddings @ chunk_embeddings.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    doc_dir = Path(sys.argv[1] if len(sys.argv) > 1 else "/root/techcorp-docs")
+    k = 3
+
+    print("⏱️ Benchmark: Chunk vs Paragraph Embedding")
+    print("=" * 55)
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    model.encode("warm up")
+
+    chunks, layouts = load_corpus(doc_dir)
+    print(f"📚 {len(chunks)} chunks from {doc_dir}")
+
+    # Current behaviour: every chunk's full text goes through the encoder
+    start = time.perf_counter()
+    chunk_embeddings = model.encode(chunks, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+    chunk_time = time.perf_counter() - start
+
+    # Paragraph reuse: each paragraph encoded once, chunk vectors composed
+    start = time.perf_counter()
+    composed_embeddings, paragraphs_encoded = compose_chunk_embeddings(model, layouts, batch_size=64)
+    paragraph_time = time.perf_counter() - start
+
+    # Retrieval quality against the per-chunk vectors as ground truth
+    similarity = np.sum(chunk_embeddings * composed_embeddings, axis=1)
+    query_embeddings = model.encode(TEST_QUESTIONS, normalize_embeddings=True, convert_to_numpy=True)
+    exact_hits = top_k(query_embeddings, chunk_embeddings, k)
+    composed_hits = top_k(query_embeddings, composed_embeddings, k)
+
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(exact_hits, composed_hits)])
+    top1_recall = np.mean([a[0] in b for a, b in zip(exact_hits, composed_hits)])
+
+    print("\n📊 Ingestion time:")
+    print("-" * 40)
+    print(f"   Per-chunk:  {chunk_time:.2f}s ({len(chunks)} texts encoded)")
+    print(f"   Paragraph:  {paragraph_time:.2f}s ({paragraphs_encoded} texts encoded)")
+    if paragraph_time > 0:
+        print(f"   Speedup:    {chunk_time / paragraph_time:.2f}x")
+
+    print("\n🎯 Retrieval quality (per-chunk vectors as reference):")
+    print("-" * 40)
+    print(f"   Mean cosine(chunk, composed): {similarity.mean():.3f} (min {similarity.min():.3f})")
+    print(f"   Top-{k} overlap:                {overlap:.0%}")
+    print(f"   Reference top-1 in top-{k}:     {top1_recall:.0%}")
+
+    print("\n💡 Use CHUNK_EMBEDDING_MODE=paragraph in Task 2 if the quality numbers are acceptable")
+
+
+if __name__ == "__main__":
+    main()
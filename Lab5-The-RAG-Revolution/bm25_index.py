@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+"""
+On-disk BM25 inverted index
+Lexical retrieval for exact terms ("401k", "VPN", policy codes) that dense search misses
+
+Usage: python3 bm25_index.py "query"         search ./bm25_index
+       python3 bm25_index.py --bench [N]     time lookups on a synthetic N-chunk index
+"""
+
+import json
+import math
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+# Built by Task 2 next to ./chroma_db
+BM25_INDEX_PATH = "./bm25_index"
+INDEX_VERSION = 2
+# Postings per block (the unit block-max pruning skips) and weight quantization levels
+BLOCK_SIZE = 128
+IMPACT_LEVELS = 255
+# Queries with at most this many candidate postings are scored in one pass instead of by doc range
+SINGLE_PASS_POSTINGS = 1 << 15
+
+_TOKEN = re.compile(r"\w+")
+# Question words that say nothing about what is asked; match_strength() leaves them out when
+# the index has never seen them (the index itself keeps every token)
+QUERY_STOPWORDS = frozenset(
+    "a an and are can could do does did for from get how i in is it me my of on or should the to "
+    "we what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    """Lowercase word tokens; keeps alphanumerics like '401k' whole"""
+    return _TOKEN.findall(text.lower())
+
+
+def _range_max(values, lo, hi):
+    """max(values[lo[i]:hi[i] + 1]) for every i (lo <= hi), from a sparse table"""
+    span = hi - lo + 1
+    levels = np.log2(span).astype(np.int64)
+    out = np.empty(len(lo), dtype=values.dtype)
+    table, level = values, 0
+    while True:
+        mask = levels == level
+        if mask.any():
+            out[mask] = np.maximum(table[lo[mask]], table[hi[mask] - (1 << level) + 1])
+        if (2 << level) > span.max(initial=1):
+            return out
+        table = np.maximum(table[:-(1 << level)], table[(1 << level):])
+        level += 1
+
+
+def _gather_ranges(starts, lengths):
+    """Concatenation of arange(start, start + length) for every range"""
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - ends + lengths, lengths) + np.arange(int(ends[-1]) if len(ends) else 0)
+
+
+def _sorted_union(arrays):
+    """Sorted distinct values of several doc index arrays"""
+    values = np.sort(np.concatenate(arrays)) if arrays else np.empty(0, np.uint32)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def _doubling_ranges(documents, first=1 << 14):
+    """Ends of doc ranges [0, first), [first, 2 * first), [2 * first, 4 * first), ... covering all documents"""
+    ends = []
+    end = min(first, documents)
+    while True:
+        ends.append(end)
+        if end >= documents:
+            return ends
+        end = min(end * 2, documents)
+
+
+def write_segment(path, doc_ids, doc_lengths, terms, term_ids, doc_indexes, tfs, avgdl, k1=1.2, b=0.75):
+    """
+    Write one segment from postings triples (term id, doc index, term frequency).
+
+    Each posting stores its doc index (uint32, doc-sorted within a term) and
+    its BM25 term-frequency weight tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl
+    / avgdl)) quantized to uint8; the idf is applied at query time. Postings
+    are grouped in blocks of BLOCK_SIZE whose last doc and highest weight are
+    kept, so searches can skip blocks that cannot reach the top k. Docs are
+    numbered in chunk id order, so ids are found again by binary search.
+    """
+    doc_ids = np.array([cid.encode("utf-8") for cid in doc_ids], dtype=bytes)
+    by_id = np.argsort(doc_ids, kind="stable")
+    rank = np.empty(len(by_id), dtype=np.int64)
+    rank[by_id] = np.arange(len(by_id))
+    doc_ids, doc_lengths = doc_ids[by_id], np.asarray(doc_lengths, dtype=np.float64)[by_id]
+    doc_indexes = rank[np.asarray(doc_indexes, dtype=np.int64)]
+
+    order = np.lexsort((doc_indexes, term_ids))
+    term_ids = np.asarray(term_ids, dtype=np.int64)[order]
+    doc_indexes = doc_indexes[order]
+    tfs = np.asarray(tfs, dtype=np.float64)[order]
+
+    norm = k1 * (1 - b + b * doc_lengths[doc_indexes] / (avgdl or 1.0))
+    weights = tfs * (k1 + 1) / (tfs + norm)
+    impacts = np.clip(np.rint(weights / (k1 + 1) * IMPACT_LEVELS), 1, IMPACT_LEVELS).astype(np.uint8)
+
+    df = np.bincount(term_ids, minlength=len(terms)).astype(np.int64)
+    offsets = np.cumsum(df) - df
+    n_blocks = -(-df // BLOCK_SIZE)
+    block_offsets = np.cumsum(n_blocks) - n_blocks
+    block_starts = np.repeat(offsets, n_blocks) + (
+        np.arange(int(n_blocks.sum())) - np.repeat(block_offsets, n_blocks)
+    ) * BLOCK_SIZE
+    block_ends = np.minimum(block_starts + BLOCK_SIZE, np.repeat(offsets + df, n_blocks))
+
+    os.makedirs(path)
+    np.save(os.path.join(path, "docs.npy"), doc_indexes.astype(np.uint32))
+    np.save(os.path.join(path, "impacts.npy"), impacts)
+    np.save(os.path.join(path, "lexicon.npy"), np.stack([offsets, df, block_offsets, n_blocks], axis=1))
+    np.save(os.path.join(path, "block_last.npy"), doc_indexes[block_ends - 1].astype(np.uint32))
+    np.save(
+        os.path.join(path, "block_max.npy"),
+        np.maximum.reduceat(impacts, block_starts) if len(block_starts) else np.empty(0, np.uint8)
+    )
+    np.save(os.path.join(path, "doc_ids.npy"), doc_ids)
+    with open(os.path.join(path, "segment.json"), "w") as f:
+        json.dump({"documents": len(doc_lengths), "total_length": float(doc_lengths.sum()), "terms": list(terms)}, f)
+
+
+def _tokenize_documents(documents):
+    """Postings triples of (chunk id, text) pairs: (ids, lengths, terms, term ids, doc indexes, tfs)"""
+    vocabulary = {}
+    doc_ids, doc_lengths = [], []
+    term_ids, doc_indexes, tfs = [], [], []
+
+    for doc_index, (cid, text) in enumerate(documents):
+        tokens = tokenize(text)
+        doc_ids.append(cid)
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+            doc_indexes.append(doc_index)
+            tfs.append(tf)
+
+    terms = sorted(vocabulary, key=vocabulary.get)
+    return doc_ids, doc_lengths, terms, term_ids, doc_indexes, tfs
+
+
+def _write_meta(path, meta):
+    """Point the index at new segments atomically, then drop the ones no longer referenced"""
+    tmp_path = os.path.join(path, "meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+    keep = {"meta.json", *meta["segments"], *([meta["deleted"]] if meta.get("deleted") else [])}
+    for name in os.listdir(path):
+        if name not in keep:
+            target = os.path.join(path, name)
+            shutil.rmtree(target, ignore_errors=True) if os.path.isdir(target) else os.remove(target)
+
+
+def _segment_name(kind):
+    return f"{kind}-{time.time_ns():x}"
+
+
+def build_index(documents, path=BM25_INDEX_PATH, k1=1.2, b=0.75):
+    """
+    Tokenize (chunk id, text) pairs and write their BM25 index as a fresh
+    base segment. Readers keep the old segments until meta.json points at
+    the new one.
+    """
+    doc_ids, doc_lengths, terms, term_ids, doc_indexes, tfs = _tokenize_documents(documents)
+    avgdl = float(np.mean(doc_lengths)) if doc_lengths else 0.0
+
+    os.makedirs(path, exist_ok=True)
+    base = _segment_name("base")
+    write_segment(os.path.join(path, base), doc_ids, doc_lengths, terms, term_ids, doc_indexes, tfs, avgdl, k1, b)
+    _write_meta(path, {"version": INDEX_VERSION, "k1": k1, "b": b, "avgdl": avgdl, "segments": [base]})
+    return len(doc_ids), len(terms)
+
+
+def update_index(upserts, deleted_ids, path=BM25_INDEX_PATH, max_delta_ratio=0.05, min_delta=2000):
+    """
+    Apply a sync's changes without rebuilding: upserts ({chunk id: text},
+    new or rewritten chunks) go to a small delta segment, rebuilt from its
+    stored texts; rewritten and deleted ids are masked out of the base
+    segment. Document frequencies keep counting masked chunks until the
+    next full rebuild, as in Lucene.
+
+    Returns False, changing nothing, when there is no index yet or the delta
+    would outgrow max(min_delta, max_delta_ratio of the base): the caller
+    then rebuilds with build_index.
+    """
+    if not Bm25Index.exists(path):
+        return False
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    base = _Segment(os.path.join(path, meta["segments"][0]))
+
+    texts = {}
+    if len(meta["segments"]) > 1:
+        with open(os.path.join(path, meta["segments"][1], "texts.json"), "r") as f:
+            texts = json.load(f)
+    changed = set(upserts) | set(deleted_ids)
+    texts = {cid: text for cid, text in texts.items() if cid not in changed}
+    texts.update(upserts)
+    if len(texts) > max(min_delta, max_delta_ratio * base.documents):
+        return False
+
+    deleted = np.zeros(base.documents, dtype=bool)
+    if meta.get("deleted"):
+        deleted |= np.load(os.path.join(path, meta["deleted"]))
+    deleted[base.find(changed)] = True
+
+    segments = [meta["segments"][0]]
+    if texts:
+        delta = _segment_name("delta")
+        doc_ids, doc_lengths, terms, term_ids, doc_indexes, tfs = _tokenize_documents(texts.items())
+        write_segment(
+            os.path.join(path, delta), doc_ids, doc_lengths, terms, term_ids, doc_indexes, tfs,
+            meta["avgdl"], meta["k1"], meta["b"]
+        )
+        with open(os.path.join(path, delta, "texts.json"), "w") as f:
+            json.dump(texts, f)
+        segments.append(delta)
+
+    deleted_name = None
+    if deleted.any():
+        deleted_name = _segment_name("deleted") + ".npy"
+        np.save(os.path.join(path, deleted_name), deleted)
+    _write_meta(path, {**meta, "segments": segments, "deleted": deleted_name})
+    return True
+
+
+class _Segment:
+    """Memory-mapped arrays of one segment; deleted masks out docs replaced since it was written"""
+
+    def __init__(self, path, deleted=None):
+        with open(os.path.join(path, "segment.json"), "r") as f:
+            info = json.load(f)
+        self.documents = info["documents"]
+        self.terms = {term: row for row, term in enumerate(info["terms"])}
+
+        def load(name):
+            # Plain ndarray views of the mapping: slicing a np.memmap costs more than reading it
+            array = np.load(os.path.join(path, name), mmap_mode="r")
+            return array.view(np.ndarray) if array.size else np.asarray(array)
+
+        self.docs = load("docs.npy")
+        self.impacts = load("impacts.npy")
+        self.lexicon = np.load(os.path.join(path, "lexicon.npy"))
+        self.block_last = load("block_last.npy")
+        self.block_max = load("block_max.npy")
+        self.doc_ids = load("doc_ids.npy")
+        self.deleted = deleted if deleted is not None and deleted.any() else None
+        self.live = self.documents - (int(self.deleted.sum()) if self.deleted is not None else 0)
+
+    def find(self, chunk_ids):
+        """Doc indexes of the chunk ids stored in this segment"""
+        keys = np.array([cid.encode("utf-8") for cid in chunk_ids], dtype=bytes)
+        if not len(keys) or not self.documents:
+            return np.empty(0, np.int64)
+        positions = np.minimum(np.searchsorted(self.doc_ids, keys), self.documents - 1)
+        return positions[self.doc_ids[positions] == keys]
+
+    def chunk_id(self, doc):
+        return self.doc_ids[doc].decode("utf-8")
+
+    def _live(self, docs):
+        return docs if self.deleted is None else docs[~self.deleted[docs]]
+
+    def df(self, term):
+        row = self.terms.get(term)
+        return 0 if row is None else int(self.lexicon[row, 1])
+
+    def postings(self, term, weight):
+        """(docs, impacts, block last docs, block upper bounds, weight) of a term present here"""
+        offset, df, block_offset, n_blocks = (int(v) for v in self.lexicon[self.terms[term]])
+        return (
+            self.docs[offset:offset + df],
+            self.impacts[offset:offset + df],
+            self.block_last[block_offset:block_offset + n_blocks],
+            self.block_max[block_offset:block_offset + n_blocks].astype(np.float64) * weight,
+            weight
+        )
+
+    def top_k(self, term_weights, k, theta=0.0, prune=True, dense_ratio=0.125):
+        """
+        Exact top-k (doc indexes, scores) for {term: idf * weight scale}, best
+        first, skipping postings that cannot beat theta, the k-th best score
+        known so far (chunks tied with it are interchangeable). Docs are
+        visited in ranges of doubling size so theta rises early, and within
+        each range:
+          * MaxScore: terms whose highest weights together cannot beat theta
+            cannot put a chunk in the top k on their own, so only the other
+            ("essential") terms' postings are candidates
+          * block-max: a block of an essential term is skipped when its own
+            highest weight plus the highest weight of every other term's
+            postings in the same doc range cannot beat theta, and a posting
+            when its weight plus that bound of the other terms cannot
+        Candidates are then scored exactly against every term's postings.
+        """
+        lists = [self.postings(term, weight) for term, weight in term_weights.items() if term in self.terms]
+        if not lists:
+            return np.empty(0, np.int64), np.empty(0)
+        if not prune:
+            return self._dense(lists, 0, self.documents, k)
+
+        # Bootstrap theta from the two highest-bounded blocks of every term
+        seed = _sorted_union([
+            docs[_gather_ranges(top * BLOCK_SIZE, np.minimum(BLOCK_SIZE, len(docs) - top * BLOCK_SIZE))]
+            for docs, _, _, upper, _ in lists
+            for top in [np.sort(np.argsort(-upper)[:2])]
+        ])
+        candidates, scores = self._top(*self._exact(lists, self._live(seed)), k)
+        if len(scores) == k:
+            theta = max(theta, float(scores[-1]))
+
+        lists.sort(key=lambda postings: float(postings[3].max()))
+        max_weights = np.cumsum([float(postings[3].max()) for postings in lists])
+        other_bounds = {}
+
+        def kept_blocks(start, end, floor):
+            essential = range(int(np.searchsorted(max_weights, floor, side="right")), len(lists))
+            for i in essential:
+                if i not in other_bounds:
+                    other_bounds[i] = self._other_bounds(lists, i)
+            return {i: self._kept_blocks(lists[i], other_bounds[i], start, end, floor) for i in essential}
+
+        # Few candidates overall: one pass. Otherwise walk doc ranges so theta can rise between them
+        kept = kept_blocks(0, self.documents, theta * (1 + 1e-12))
+        if sum(int(lengths.sum()) for _, lengths in kept.values()) <= SINGLE_PASS_POSTINGS:
+            ends = [self.documents]
+        else:
+            ends, kept = _doubling_ranges(self.documents), None
+
+        start = 0
+        for end in ends:
+            floor = theta * (1 + 1e-12)
+            kept = kept or kept_blocks(start, end, floor)
+
+            if sum(int(lengths.sum()) for _, lengths in kept.values()) > dense_ratio * (end - start):
+                # Little to skip in this range: accumulate every posting densely
+                range_candidates, range_scores = self._dense(lists, start, end, k)
+            else:
+                range_candidates = self._live(_sorted_union([
+                    self._candidates(lists[i], other_bounds[i], blocks, floor) for i, blocks in kept.items()
+                ]))
+                range_candidates, range_scores = self._exact(
+                    lists, range_candidates, k, theta, min(kept, default=len(lists)), max_weights
+                )
+
+            # The seeds may turn up again
+            candidates, first = np.unique(np.concatenate([candidates, range_candidates]), return_index=True)
+            candidates, scores = self._top(candidates, np.concatenate([scores, range_scores])[first], k)
+            if len(scores) == k:
+                theta = max(theta, float(scores[-1]))
+            start, kept = end, None
+        return candidates, scores
+
+    def _dense(self, lists, start, end, k):
+        """Top-k (docs, scores) among docs [start, end), accumulating every posting without pruning"""
+        scores = np.zeros(end - start)
+        for docs, impacts, _, _, weight in lists:
+            lo, hi = np.searchsorted(docs, np.array((start, end), dtype=docs.dtype))
+            # A term has one posting per doc, so the scatter-add never sees an index twice
+            np.add.at(scores, docs[lo:hi] - docs.dtype.type(start), impacts[lo:hi] * weight)
+        if self.deleted is not None:
+            scores[self.deleted[start:end]] = 0.0
+        candidates, top_scores = self._top(np.arange(start, end), scores, k)
+        return candidates[top_scores > 0], top_scores[top_scores > 0]
+
+    @staticmethod
+    def _top(candidates, scores, k):
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return candidates[top], scores[top]
+
+    @staticmethod
+    def _exact(lists, candidates, k=None, theta=0.0, first_essential=0, max_weights=None):
+        """
+        Full scores of sorted candidate docs, looked up in every term's
+        postings. Terms before first_essential (sorted by highest weight,
+        max_weights being its running sum) are looked up last, highest
+        first, dropping the candidates that cannot reach the top k even with
+        the highest weights of the terms still left.
+        """
+        scores = np.zeros(len(candidates))
+        for i in [*range(first_essential, len(lists)), *range(first_essential - 1, -1, -1)]:
+            if i < first_essential and len(scores):
+                if len(scores) >= k:
+                    theta = max(theta, float(np.partition(scores, len(scores) - k)[len(scores) - k]))
+                keep = scores + max_weights[i] > theta * (1 + 1e-12)
+                candidates, scores = candidates[keep], scores[keep]
+            docs, impacts, _, _, weight = lists[i]
+            position = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            scores += np.where(docs[position] == candidates, impacts[position] * weight, 0.0)
+        return candidates, scores
+
+    @staticmethod
+    def _other_bounds(lists, i):
+        """Per block of term i: the highest weight the other terms' postings in its doc range can add"""
+        docs, _, last, upper, _ = lists[i]
+        first = docs[::BLOCK_SIZE]
+        bound = np.zeros(len(upper))
+        for j, (other_docs, _, _, other_upper, _) in enumerate(lists):
+            if j == i:
+                continue
+            lo = np.searchsorted(other_docs, first)
+            hi = np.searchsorted(other_docs, last, side="right")
+            present = hi > lo
+            if present.any():
+                bound[present] += _range_max(
+                    other_upper, lo[present] // BLOCK_SIZE, (hi[present] - 1) // BLOCK_SIZE
+                )
+        return bound
+
+    @staticmethod
+    def _kept_blocks(postings, other_bound, start, end, floor):
+        """(first positions, lengths) of one term's blocks in doc range [start, end) whose score bound beats floor"""
+        docs, _, _, upper, _ = postings
+        lo, hi = (int(position) for position in np.searchsorted(docs, np.array((start, end), dtype=docs.dtype)))
+        if lo == hi:
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        first, last = lo // BLOCK_SIZE, (hi - 1) // BLOCK_SIZE + 1
+        blocks = first + np.flatnonzero(upper[first:last] + other_bound[first:last] > floor)
+        block_starts = np.maximum(blocks * BLOCK_SIZE, lo)
+        return block_starts, np.minimum((blocks + 1) * BLOCK_SIZE, hi) - block_starts
+
+    @staticmethod
+    def _candidates(postings, other_bound, kept, floor):
+        """Docs of the kept blocks whose own weight plus the other terms' bound beats floor"""
+        docs, impacts, _, _, weight = postings
+        positions = _gather_ranges(*kept)
+        return docs[positions[impacts[positions] * weight + other_bound[positions // BLOCK_SIZE] > floor]]
+
+
+class Bm25Index:
+    """
+    Read side of the index: segments are memory-mapped and searched with
+    block-max pruning, so only the blocks that can hold a top-k chunk are read.
+
+    Terms in more than max_df_ratio of all chunks carry almost no BM25
+    weight but have the longest postings, so they are skipped unless the
+    query has nothing else.
+    """
+
+    def __init__(self, path=BM25_INDEX_PATH, max_df_ratio=0.5):
+        self.path = path
+        self.max_df_ratio = max_df_ratio
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def exists(path=BM25_INDEX_PATH):
+        """True if a current-version index is there (older ones are rebuilt by Task 2)"""
+        try:
+            with open(os.path.join(path, "meta.json"), "r") as f:
+                return json.load(f).get("version") == INDEX_VERSION
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def load(self):
+        meta_path = os.path.join(self.path, "meta.json")
+        for attempt in range(2):
+            mtime = os.stat(meta_path).st_mtime_ns
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta.get("version") != INDEX_VERSION:
+                raise ValueError(f"{self.path} was built by another index version; re-run Task 2")
+            try:
+                # The deleted mask covers the base segment, the first one
+                deleted = np.load(os.path.join(self.path, meta["deleted"])) if meta.get("deleted") else None
+                segments = [
+                    _Segment(os.path.join(self.path, name), deleted if i == 0 else None)
+                    for i, name in enumerate(meta["segments"])
+                ]
+                break
+            except FileNotFoundError:
+                if attempt:
+                    raise  # replaced twice while loading
+
+        # Swapped in as one object so concurrent searches never mix two index versions
+        self._state = {
+            "segments": segments,
+            "documents": sum(segment.documents for segment in segments),
+            "weight_scale": (meta["k1"] + 1) / IMPACT_LEVELS
+        }
+        self._mtime = mtime
+
+    def reload_if_changed(self):
+        """Pick up an index Task 2 rebuilt or updated since it was loaded"""
+        try:
+            mtime = os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self.load()
+
+    def __len__(self):
+        return sum(segment.live for segment in self._state["segments"])
+
+    def _idf(self, state, query):
+        """({scored term: idf}, query terms missing from the index)"""
+        segments, documents = state["segments"], state["documents"]
+        df = {term: sum(segment.df(term) for segment in segments) for term in set(tokenize(query))}
+        missing = [term for term, n in df.items() if not n]
+        df = {term: n for term, n in df.items() if n}
+
+        rare = {term: n for term, n in df.items() if n <= self.max_df_ratio * documents}
+        df = rare or df
+        return {term: math.log(1 + (documents - n + 0.5) / (n + 0.5)) for term, n in df.items()}, missing
+
+    def search(self, query, k=10, prune=True):
+        """Top-k (chunk id, BM25 score) for a query string, best first (prune=False scores exhaustively)"""
+        state = self._state
+        idf, _ = self._idf(state, query)
+        if not idf or not state["documents"]:
+            return []
+        term_weights = {term: weight * state["weight_scale"] for term, weight in idf.items()}
+
+        # Smallest segment first, so its k-th score lets the larger ones skip more
+        hits = []
+        for segment in sorted(state["segments"], key=lambda segment: segment.documents):
+            theta = hits[k - 1][0] if len(hits) >= k else 0.0
+            docs, scores = segment.top_k(term_weights, k, theta, prune)
+            hits = sorted(hits + [(float(s), segment.chunk_id(d)) for d, s in zip(docs, scores)], reverse=True)[:k]
+        return [(cid, score) for score, cid in hits]
+
+    def match_strength(self, query, score):
+        """
+        How much of the query a chunk with this BM25 score matched: the score
+        over what a chunk of average length holding every query term once
+        would get, terms the index has never seen (other than QUERY_STOPWORDS)
+        included. Around 1.0 when a chunk has all of the question's
+        informative words.
+        """
+        state = self._state
+        idf, missing = self._idf(state, query)
+        missing = [term for term in missing if term not in QUERY_STOPWORDS]
+        documents = state["documents"]
+        full = sum(idf.values()) + len(missing) * math.log(1 + (documents + 0.5) / 0.5)
+        return score / full if full else 0.0
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked id lists: score(id) = sum of 1 / (k + rank), best first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def benchmark(documents=1_000_000, vocabulary=200_000, terms_per_doc=40, queries=1000, k=10):
+    """
+    Build a synthetic Zipf-distributed index and time single-query lookups.
+    Query terms follow the same Zipf distribution as the text, like real
+    queries that mostly use common words; pruned results are checked
+    against exhaustive scoring.
+    """
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    term_ids = np.minimum(rng.zipf(1.2, size=documents * terms_per_doc) - 1, vocabulary - 1)
+    doc_indexes = np.repeat(np.arange(documents), terms_per_doc)
+    pairs = np.unique(term_ids * documents + doc_indexes)
+    term_ids, doc_indexes = pairs // documents, pairs % documents
+    tfs = rng.integers(1, 4, size=len(pairs))
+
+    path = os.path.join(tempfile.mkdtemp(), "bm25_bench")
+    os.makedirs(path)
+    started = time.perf_counter()
+    base = _segment_name("base")
+    write_segment(
+        os.path.join(path, base), [f"chunk_{i}" for i in range(documents)], np.full(documents, terms_per_doc),
+        [f"t{i}" for i in range(vocabulary)], term_ids, doc_indexes, tfs, float(terms_per_doc)
+    )
+    _write_meta(path, {"version": INDEX_VERSION, "k1": 1.2, "b": 0.75, "avgdl": float(terms_per_doc),
+                       "segments": [base]})
+    size = sum(os.path.getsize(os.path.join(path, base, name)) for name in os.listdir(os.path.join(path, base)))
+    print(f"🏗️ Built {documents:,} chunks / {len(pairs):,} postings in {time.perf_counter() - started:.1f}s "
+          f"({size / 2**20:.1f} MiB on disk)")
+
+    index = Bm25Index(path)
+    query_terms = np.minimum(rng.zipf(1.2, size=(queries, 3)) - 1, vocabulary - 1)
+    query_strings = [" ".join(f"t{i}" for i in row) for row in query_terms] + ["t20 t30 t40"]
+
+    # Pruning only pays off when some query term is selective
+    selective = np.array([
+        min(sum(segment.df(term) for segment in index._state["segments"]) for term in query.split())
+        < 0.05 * documents
+        for query in query_strings[:-1]
+    ])
+
+    for prune in (False, True):
+        latencies, results = [], []
+        for query in query_strings:
+            started = time.perf_counter()
+            results.append(index.search(query, k=k, prune=prune))
+            latencies.append(time.perf_counter() - started)
+        if not prune:
+            exhaustive = results
+        named = latencies.pop() * 1000
+        latencies = np.array(latencies) * 1000
+        print(f"🔎 {queries} lookups ({'block-max pruned' if prune else 'exhaustive'}): "
+              f"p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms, "
+              f"'t20 t30 t40' {named:.2f} ms")
+        for label, mask in (("with a term in <5% of chunks", selective), ("only common terms", ~selective)):
+            if mask.any():
+                print(f"   {mask.sum():4d} {label}: p50 {np.percentile(latencies[mask], 50):.2f} ms, "
+                      f"p99 {np.percentile(latencies[mask], 99):.2f} ms")
+
+    # Pruning must not change results (ties at the k-th score may swap chunk ids)
+    mismatches = sum(
+        [round(score, 9) for _, score in pruned] != [round(score, 9) for _, score in full]
+        for pruned, full in zip(results, exhaustive)
+    )
+    print(f"{'✅' if not mismatches else '❌'} Pruned top-{k} scores match exhaustive scoring "
+          f"for {len(results) - mismatches} of {len(results)} queries")
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+def main():
+    if sys.argv[1:2] == ["--bench"]:
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000)
+        return
+
+    index = Bm25Index()
+    query = " ".join(sys.argv[1:]) or "401k VPN"
+    started = time.perf_counter()
+    hits = index.search(query, k=10)
+    print(f"🔎 '{query}': {len(hits)} hits in {(time.perf_counter() - started) * 1000:.3f} ms")
+    for cid, score in hits:
+        print(f"   {score:7.3f}  {cid}")
+
+
+if __name__ == "__main__":
+    main()
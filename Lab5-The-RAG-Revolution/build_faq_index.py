@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Build the precomputed FAQ answer index
+Answers recurring questions offline with rag_pipeline_batch and stores them, with the
+chunk versions they were generated from, in ./faq_index.npz for Task 5 to serve
+
+Usage: python3 build_faq_index.py questions.txt     # one question per line
+       python3 build_faq_index.py --from-log [N]    # the N (default 300) most asked logged questions
+       python3 build_faq_index.py --refresh         # rebuild only entries whose chunks were re-ingested
+"""
+
+import os
+import sys
+import time
+
+from answer_cache import ChunkVersions
+from faq_index import FAQ_INDEX_PATH, FaqIndex, mine_questions, save_faq_index
+from task_5_complete_rag import metrics, run_rag_pipeline_batch
+
+FAQ_MIN_COUNT = int(os.getenv("FAQ_MIN_COUNT", "2"))
+
+
+def answer_questions(questions, asked=None):
+    """
+    (entries, question embeddings) for the questions the handbook can
+    answer; fallback answers are left out so they never shadow a later,
+    better answer.
+    """
+    trace = metrics.trace(None)
+    results, embeddings = run_rag_pipeline_batch(questions, trace)
+    trace.finish("faq_build")
+
+    versions = ChunkVersions().current()
+    entries, vectors = [], []
+    for i, (answer, outcome, chunk_ids) in enumerate(results):
+        if outcome == "fallback":
+            print(f"   ⛔ Skipped (low retrieval confidence): {questions[i]}")
+            continue
+        entries.append({
+            "question": questions[i],
+            "answer": answer,
+            "chunks": {cid: versions.get(cid) for cid in chunk_ids},
+            "asked": asked[i] if asked else 0
+        })
+        vectors.append(embeddings[i])
+    return entries, vectors
+
+
+def build(questions, asked=None, path=FAQ_INDEX_PATH):
+    started = time.perf_counter()
+    entries, vectors = answer_questions(questions, asked)
+    save_faq_index(entries, vectors, path)
+    print(f"✅ FAQ index: {len(entries)} of {len(questions)} questions answered "
+          f"in {time.perf_counter() - started:.1f}s → {path}")
+    return len(entries)
+
+
+def refresh_stale(index):
+    """
+    Regenerate the entries whose source chunks changed since they were
+    built, keep every other entry as it is. Returns the number of
+    entries rebuilt (rag_service.py calls this periodically).
+    """
+    index.reload_if_changed()
+    stale = index.stale_entries()
+    if not stale:
+        return 0
+
+    stale_questions = {entry["question"] for entry in stale}
+    entries, vectors = index.snapshot()
+    kept = [i for i, entry in enumerate(entries) if entry["question"] not in stale_questions]
+
+    rebuilt, rebuilt_vectors = answer_questions(
+        [entry["question"] for entry in stale], [entry.get("asked", 0) for entry in stale]
+    )
+    save_faq_index(
+        [entries[i] for i in kept] + rebuilt,
+        [vectors[i] for i in kept] + rebuilt_vectors,
+        index.path
+    )
+    index.reload_if_changed()
+    print(f"🔁 FAQ index: rebuilt {len(rebuilt)} of {len(stale)} stale entries")
+    return len(rebuilt)
+
+
+def main(argv):
+    if argv[:1] == ["--refresh"]:
+        if not FaqIndex.exists():
+            print("⚠️ No FAQ index yet - build one first")
+            return 1
+        index = FaqIndex()
+        if not refresh_stale(index):
+            print(f"✅ All {len(index)} FAQ entries are current")
+        return 0
+
+    if argv[:1] == ["--from-log"]:
+        top = int(argv[1]) if len(argv) > 1 else 300
+        log_path = os.getenv("RAG_METRICS_LOG", "./rag_requests.jsonl")
+        if not os.path.exists(log_path):
+            print(f"⚠️ No request log at {log_path}: run Task 5 or rag_service.py with RAG_METRICS=1 first")
+            return 1
+        mined = mine_questions(log_path, top, FAQ_MIN_COUNT)
+        print(f"\n⛏️ Mined {len(mined)} questions asked at least {FAQ_MIN_COUNT} times")
+        for question, count in mined[:10]:
+            print(f"   {count:5d}×  {question}")
+        questions, asked = [q for q, _ in mined], [n for _, n in mined]
+    elif argv:
+        with open(argv[0], "r") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        asked = None
+    else:
+        print(__doc__)
+        return 1
+
+    if not questions:
+        print("⚠️ No questions to answer")
+        return 1
+    build(questions, asked)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
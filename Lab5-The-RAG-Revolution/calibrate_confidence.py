@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Calibrate the retrieval-confidence gate
+Compares top-hit similarities of questions the handbook answers with questions it doesn't,
+then suggests RAG_MIN_SIMILARITY for task_5_complete_rag.py
+
+Usage: python3 calibrate_confidence.py
+"""
+
+from confidence_gate import ConfidenceGate, distance_to_similarity
+from task_5_complete_rag import collection, confidence_gate, model
+
+ANSWERABLE = [
+    "Can I bring my dog to the office?",
+    "How many vacation days do I get?",
+    "What is the remote work policy?",
+    "Is VPN required when working from home?",
+    "How do I reset my password?",
+    "What are the core working hours?",
+    "How do I request time off?",
+    "What benefits does TechCorp offer?"
+]
+
+UNANSWERABLE = [
+    "What is the capital of Australia?",
+    "How do I bake sourdough bread?",
+    "Who won the 1998 World Cup?",
+    "What is the boiling point of mercury?",
+    "Recommend a good science fiction novel",
+    "How far is the Moon from Earth?",
+    "What is the best way to learn the violin?",
+    "Translate 'good morning' into Japanese"
+]
+
+
+def top_similarities(questions, space):
+    results = collection.query(query_embeddings=model.encode(questions).tolist(), n_results=1)
+    return [distance_to_similarity(distances[0], space) for distances in results['distances'] if distances]
+
+
+def main():
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    answerable = top_similarities(ANSWERABLE, space)
+    unanswerable = top_similarities(UNANSWERABLE, space)
+
+    print("\n🎯 Top-hit similarity")
+    print("-" * 50)
+    for label, questions, scores in (("✅", ANSWERABLE, answerable), ("❌", UNANSWERABLE, unanswerable)):
+        for question, score in zip(questions, scores):
+            print(f"   {label} {score:.3f}  {question}")
+
+    current = confidence_gate.min_similarity if confidence_gate is not None else 0.3
+    threshold = ConfidenceGate.calibrate(answerable, unanswerable, default=current)
+    missed = sum(s < threshold for s in answerable)
+    leaked = sum(s >= threshold for s in unanswerable)
+
+    print("\n" + "=" * 50)
+    if confidence_gate is not None:
+        print(f"Current RAG_MIN_SIMILARITY: {confidence_gate.min_similarity:.3f}")
+    print(f"Suggested RAG_MIN_SIMILARITY: {threshold:.3f}")
+    print(f"   Answerable questions gated: {missed}/{len(answerable)}")
+    print(f"   Unanswerable questions sent to the LLM: {leaked}/{len(unanswerable)}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate chunk detection with MinHash + LSH
+Boilerplate repeated across handbook files is embedded and stored once
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_WORD = re.compile(r"\w+")
+
+
+class NearDuplicateIndex:
+    """
+    In-memory MinHash/LSH index over chunk texts.
+
+    Each text gets a num_perm MinHash signature over word shingles. The
+    signature is split into `bands` LSH bands. A text whose estimated Jaccard
+    similarity to an indexed text reaches `threshold` is a near-duplicate.
+    Texts with fewer than min_shingles shingles (a heading, a line of
+    symbols) are never matched: their signatures are too coarse to tell
+    them apart.
+    """
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.85, shingle_size=3, min_shingles=5, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.min_shingles = min_shingles
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.int64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=(num_perm, 1), dtype=np.int64)
+
+        self._buckets = [{} for _ in range(bands)]  # band value -> representative ids
+        self._signatures = {}  # representative id -> signature
+
+    def signature(self, text):
+        """MinHash signature of text, or None when it has fewer than min_shingles shingles"""
+        words = _WORD.findall(text.lower())
+        k = self.shingle_size
+        if len(words) - k + 1 < self.min_shingles:
+            return None
+        shingles = {
+            zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) & _MERSENNE_PRIME
+            for i in range(len(words) - k + 1)
+        }
+        x = np.fromiter(shingles, dtype=np.int64, count=len(shingles))[None, :]
+        return ((self._a * x + self._b) % _MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def find(self, text):
+        """Return (representative id or None, signature) for text; signature is None for a text too short to match"""
+        signature = self.signature(text)
+        if signature is None:
+            return None, None
+
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best_id, best_score = None, self.threshold
+        for rep_id in candidates:
+            score = float(np.mean(self._signatures[rep_id] == signature))
+            if score >= best_score:
+                best_id, best_score = rep_id, score
+        return best_id, signature
+
+    def add(self, rep_id, signature):
+        """Index a text (by the signature find() returned) as a representative"""
+        self._signatures[rep_id] = signature
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, []).append(rep_id)
+
+    def __len__(self):
+        return len(self._signatures)
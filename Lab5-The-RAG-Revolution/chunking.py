@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Document chunking for TechCorp ingestion
+Pure-Python read/hash/chunk work that Task 2 runs in worker processes
+"""
+
+from ingest_manifest import hash_file, hash_text, chunk_id
+
+
+def smart_chunk_document(text, overlap_ratio=0.2):
+    """
+    Smart paragraph-based chunking with overlap: every paragraph joined with
+    the next one, after the last overlap_ratio of the previous paragraph
+    """
+    return [chunk for chunk, _ in iter_smart_chunks(text.split("\n\n"), overlap_ratio)]
+
+
+def document_metadata(path, category_dir):
+    """Metadata stored with every chunk of a document"""
+    return {
+        "source": path.name,
+        "section": category_dir.name
+    }
+
+
+def smart_chunk_parts(text, overlap_ratio=0.2):
+    """
+    Paragraph layout of every chunk smart_chunk_document(text) produces.
+
+    Each chunk is described as a list of (paragraph text, characters used):
+    the overlap tail of the previous paragraph, the current paragraph and
+    the next one. Lets chunk embeddings be composed from paragraph embeddings.
+    """
+    return [
+        parts for _, parts in iter_smart_chunks(text.split("\n\n"), overlap_ratio, with_parts=True)
+    ]
+
+
+def sample_chunks(doc_dir, limit=512):
+    """Up to `limit` chunks from the corpus, e.g. for calibration runs"""
+    samples = []
+    for doc_file in sorted(doc_dir.glob("*/*.md")):
+        with open(doc_file, "r") as f:
+            samples.extend(smart_chunk_document(f.read()))
+        if len(samples) >= limit:
+            break
+    return samples[:limit]
+
+
+def iter_paragraphs(path, block_size=1 << 16):
+    """
+    Yield the paragraphs of a file exactly as open(path).read().split("\n\n")
+    would, reading it in blocks so only the current paragraph is held in memory.
+    """
+    with open(path, "r") as f:
+        buffer = ""
+        scan_from = 0
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            buffer += block
+
+            start = 0
+            while True:
+                end = buffer.find("\n\n", max(start, scan_from))
+                if end == -1:
+                    break
+                yield buffer[start:end]
+                start = end + 2
+                scan_from = start
+
+            buffer = buffer[start:]
+            # A "\n" at the very end may pair with one in the next block
+            scan_from = max(0, len(buffer) - 1)
+
+        yield buffer
+
+
+def iter_smart_chunks(paragraphs, overlap_ratio=0.2, with_parts=False):
+    """
+    Sliding-window version of smart_chunk_document over any paragraph
+    iterable: yields (chunk, parts) with the same chunks in the same order
+    while holding only three paragraphs. parts is the smart_chunk_parts
+    layout when with_parts is set, else None.
+    """
+    previous = None
+    window = iter(paragraphs)
+    current = next(window, None)
+
+    while current is not None:
+        following = next(window, None)
+
+        parts = []
+        if previous is not None and overlap_ratio > 0:
+            overlap_chars = int(len(previous) * overlap_ratio)
+            if overlap_chars > 0:
+                parts.append((previous, overlap_chars))
+        parts.append((current, len(current)))
+        if following is not None:
+            parts.append((following, len(following)))
+
+        chunk = " ".join(text[-chars:] if chars < len(text) else text for text, chars in parts)
+        yield chunk, (parts if with_parts else None)
+
+        previous, current = current, following
+
+
+def _tap(paragraphs, on_paragraph):
+    for paragraph in paragraphs:
+        on_paragraph(paragraph)
+        yield paragraph
+
+
+def stream_document(task, with_parts=False, emit=None, on_paragraph=None, chunker=None, make_metadata=None):
+    """
+    Hash, read and chunk one document, passing (id, text, metadata, parts)
+    records for changed chunks to emit() as they are produced. If given,
+    on_paragraph() gets every paragraph of a changed file from the same read.
+
+    chunker(text) and make_metadata(path, category_dir) replace
+    smart_chunk_document and document_metadata (Task 2 passes its own). A
+    chunker needs the whole text, so the file is then read at once instead
+    of streamed, and parts keep the smart_chunk_parts layout.
+
+    task is (path, section, old_entry) where old_entry is the file's manifest
+    entry or None. Returns None when the file is unchanged, otherwise a dict
+    with the number of changed chunks, the stale chunk ids to delete and the
+    new manifest entry. Memory stays bounded by the paragraph window.
+    """
+    path, section, old_entry = task
+
+    file_hash = hash_file(path)
+    if old_entry is not None and old_entry["hash"] == file_hash:
+        return None
+
+    metadata = (make_metadata or document_metadata)(path, path.parent)
+
+    # Only chunks whose text changed are re-embedded
+    old_hashes = old_entry["chunks"] if old_entry is not None else []
+    chunk_hashes = []
+    changed = 0
+
+    if chunker is None:
+        paragraphs = iter_paragraphs(path)
+        if on_paragraph is not None:
+            paragraphs = _tap(paragraphs, on_paragraph)
+        chunked = iter_smart_chunks(paragraphs, with_parts=with_parts)
+    else:
+        with open(path, "r") as f:
+            text = f.read()
+        if on_paragraph is not None:
+            for paragraph in text.split("\n\n"):
+                on_paragraph(paragraph)
+        layouts = smart_chunk_parts(text) if with_parts else []
+        chunked = ((chunk, layouts[i] if i < len(layouts) else None) for i, chunk in enumerate(chunker(text)))
+
+    for i, (chunk, parts) in enumerate(chunked):
+        chunk_hash = hash_text(chunk)
+        chunk_hashes.append(chunk_hash)
+        if i >= len(old_hashes) or old_hashes[i] != chunk_hash:
+            emit((chunk_id(section, path.stem, i), chunk, metadata, parts))
+            changed += 1
+
+    return {
+        "source": path.name,
+        "changed": changed,
+        "stale_ids": [chunk_id(section, path.stem, i) for i in range(len(chunk_hashes), len(old_hashes))],
+        "entry": {
+            "hash": file_hash,
+            "section": section,
+            "stem": path.stem,
+            "chunks": chunk_hashes
+        }
+    }
+
+
+def process_document(task, with_parts=False, with_paragraphs=False, chunker=None, make_metadata=None):
+    """
+    stream_document for a worker process: the records to embed are collected
+    and returned under "records" instead of being emitted one by one, and
+    with_paragraphs returns the file's paragraphs under "paragraphs".
+    """
+    records, paragraphs = [], []
+    result = stream_document(
+        task, with_parts, records.append, paragraphs.append if with_paragraphs else None, chunker, make_metadata
+    )
+    if result is not None:
+        result["records"] = records
+        if with_paragraphs:
+            result["paragraphs"] = paragraphs
+    return result
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Retrieval-confidence gate
+Answers the canned fallback without an LLM call when retrieval found nothing relevant
+"""
+
+FALLBACK_ANSWER = "I don't have that information in the provided documents."
+
+
+def distance_to_similarity(distance, space="l2"):
+    """
+    Cosine similarity from a Chroma distance. all-MiniLM-L6-v2 vectors are
+    unit length, so squared L2 (Chroma's default space) is 2 - 2*cos.
+    """
+    if space == "l2":
+        return 1.0 - distance / 2.0
+    return 1.0 - distance  # "cosine" and "ip" distances are 1 - similarity
+
+
+class ConfidenceGate:
+    """
+    Decides from the distances collection.query returned whether an LLM call
+    is worth making.
+
+    A question passes when its best hit has cosine similarity of at least
+    min_similarity. With min_gap > 0, a best hit less than min_gap above the
+    threshold must also lead the last hit by min_gap: uniformly mediocre
+    matches are treated as no match.
+
+    With min_lexical set, a question the dense hits fail also passes when
+    its best BM25 hit matched at least that share of it
+    (Bm25Index.match_strength): exact terms like policy codes often embed
+    poorly but are a strong lexical signal.
+    """
+
+    def __init__(self, min_similarity=0.3, min_gap=0.0, space="l2", min_lexical=None):
+        self.min_similarity = min_similarity
+        self.min_gap = min_gap
+        self.space = space
+        self.min_lexical = min_lexical
+        self.checked = 0
+        self.llm_calls_avoided = 0
+        self.lexical_passes = 0
+
+    def check(self, distances, lexical=None):
+        """Returns (passed, top similarity) and updates the counters"""
+        similarities = [distance_to_similarity(d, self.space) for d in distances]
+        top = similarities[0] if similarities else -1.0
+
+        passed = top >= self.min_similarity
+        if passed and self.min_gap > 0 and len(similarities) > 1 and top < self.min_similarity + self.min_gap:
+            passed = top - similarities[-1] >= self.min_gap
+        if not passed and self.min_lexical is not None and lexical is not None and lexical >= self.min_lexical:
+            passed = True
+            self.lexical_passes += 1
+
+        self.checked += 1
+        if not passed:
+            self.llm_calls_avoided += 1
+        return passed, top
+
+    @staticmethod
+    def calibrate(answerable_scores, unanswerable_scores, default=0.3):
+        """
+        Threshold that best separates the top similarities of questions the
+        documents answer from those they don't (midpoint with fewest errors).
+        Returns default when there are no scores to separate.
+        """
+        scores = sorted(set(answerable_scores) | set(unanswerable_scores))
+        if not scores:
+            return default
+        candidates = [(a + b) / 2 for a, b in zip(scores, scores[1:])] or scores
+
+        def errors(threshold):
+            return (sum(s < threshold for s in answerable_scores) +
+                    sum(s >= threshold for s in unanswerable_scores))
+
+        return min(candidates, key=errors)
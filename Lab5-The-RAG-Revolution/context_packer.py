@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted context packing
+Drops paragraphs and long token runs repeated across retrieved chunks and fits the rest into a token budget
+"""
+
+import re
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken ships with langchain-openai; fall back to a rough word tokenizer
+    tiktoken = None
+
+_ROUGH_TOKEN = re.compile(r"\s*\w+|\s*[^\w\s]")
+
+
+class _RoughEncoding:
+    """Stand-in for a tiktoken encoding when tiktoken is not installed"""
+
+    def encode(self, text):
+        return _ROUGH_TOKEN.findall(text)
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+def get_encoding(name="o200k_base"):
+    """Tokenizer of the gpt-4.1 family (o200k_base), or the rough fallback"""
+    if tiktoken is None:
+        return _RoughEncoding()
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:  # the BPE file is downloaded on first use, which fails offline
+        print(f"⚠️ tiktoken {name} unavailable ({e}), counting tokens roughly")
+        return _RoughEncoding()
+
+
+def _normalize(paragraph):
+    return " ".join(paragraph.split())
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks, best first, into at most token_budget tokens.
+
+    Chunks are split into paragraphs at blank lines (parent store spans
+    keep them). A paragraph that was already packed from a better chunk,
+    or that is part of one (an overlap tail), is dropped. Raw
+    smart_chunk_document windows join their paragraphs with a space, so
+    what survives is also compared token by token: any run of at least
+    min_shared tokens that a better chunk already packed is cut, and the
+    rest of the chunk is kept in order with " ... " where text was removed.
+    min_shared is long enough that a common phrase in otherwise unrelated
+    text is not a match. The last chunk that fits is truncated to the
+    remaining budget.
+    """
+
+    def __init__(self, token_budget=1500, min_shared=12, encoding=None):
+        self.token_budget = token_budget
+        self.min_shared = min_shared
+        self.encoding = encoding if encoding is not None else get_encoding()
+        self.requests = 0
+        self.raw_tokens = 0
+        self.tokens_saved = 0
+        self.paragraphs_dropped = 0
+        self.runs_dropped = 0
+
+    def _new_paragraphs(self, chunk, seen):
+        """The chunk's paragraphs that no packed paragraph already contains"""
+        kept = []
+        for paragraph in chunk.split("\n\n"):
+            key = _normalize(paragraph)
+            if not key:
+                continue
+            if key in seen or any(key in packed for packed in seen):
+                self.paragraphs_dropped += 1
+                continue
+            seen.add(key)
+            kept.append(paragraph.strip())
+        return kept
+
+    def _ngrams(self, tokens):
+        n = self.min_shared
+        return (tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+    def _new_spans(self, tokens, seen_ngrams):
+        """Runs of tokens left after cutting every shared run of min_shared tokens or more"""
+        n = self.min_shared
+        covered = [False] * len(tokens)
+        for i, gram in enumerate(self._ngrams(tokens)):
+            if gram in seen_ngrams:
+                covered[i:i + n] = [True] * n
+
+        if not any(covered):
+            return [tokens]
+
+        spans, current, in_run = [], [], False
+        for token, is_covered in zip(tokens, covered):
+            if is_covered:
+                self.runs_dropped += not in_run
+                if current:
+                    spans.append(current)
+                current = []
+            else:
+                current.append(token)
+            in_run = is_covered
+        if current:
+            spans.append(current)
+
+        # Drop slivers left between two shared runs (joining whitespace, stray punctuation)
+        return [span for span in spans if len(span) * 4 >= n]
+
+    def pack(self, chunks):
+        """
+        Returns {"chunks": packed texts in the input order, "tokens": tokens
+        used, "raw_tokens": tokens of the chunks as given, "tokens_saved"}
+        """
+        raw_tokens = sum(len(self.encoding.encode(chunk)) for chunk in chunks)
+
+        packed, seen, seen_ngrams, used = [], set(), set(), 0
+        for chunk in chunks:
+            remaining = self.token_budget - used
+            if remaining <= 0:
+                break
+
+            paragraphs = self._new_paragraphs(chunk, seen)
+            if not paragraphs:
+                continue
+
+            tokens = self.encoding.encode("\n\n".join(paragraphs))
+            spans = self._new_spans(tokens, seen_ngrams)
+            seen_ngrams.update(self._ngrams(tokens))
+
+            kept = []
+            for span in spans:
+                span = span[:remaining - sum(len(s) for s in kept)]
+                if span:
+                    kept.append(span)
+            if not kept:
+                continue
+
+            used += sum(len(span) for span in kept)
+            packed.append(" ... ".join(self.encoding.decode(span).strip() for span in kept))
+
+        self.requests += 1
+        self.raw_tokens += raw_tokens
+        self.tokens_saved += raw_tokens - used
+        return {
+            "chunks": packed,
+            "tokens": used,
+            "raw_tokens": raw_tokens,
+            "tokens_saved": raw_tokens - used
+        }
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "raw_tokens": self.raw_tokens,
+            "tokens_saved": self.tokens_saved,
+            "paragraphs_dropped": self.paragraphs_dropped,
+            "runs_dropped": self.runs_dropped,
+            "saved_ratio": self.tokens_saved / self.raw_tokens if self.raw_tokens else 0.0
+        }
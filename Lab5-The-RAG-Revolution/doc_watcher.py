@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Directory watcher for continuous ingestion
+Reports created, modified and deleted <section>/<file>.md documents in debounced micro-batches
+"""
+
+import threading
+import time
+from pathlib import Path
+
+from ingest_manifest import file_key
+
+# inotify (through watchdog) when available, mtime polling otherwise
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+def document_key(doc_dir, path):
+    """Manifest key for a path directly inside a category dir, else None"""
+    try:
+        relative = Path(path).resolve().relative_to(Path(doc_dir).resolve())
+    except ValueError:
+        return None
+    if len(relative.parts) != 2 or relative.suffix != ".md":
+        return None
+    return file_key(relative.parts[0], relative.parts[1])
+
+
+def snapshot(doc_dir):
+    """{key: (mtime_ns, size)} for every document, used by the polling fallback"""
+    state = {}
+    for category_dir in Path(doc_dir).iterdir():
+        if category_dir.is_dir():
+            for doc_file in category_dir.glob("*.md"):
+                try:
+                    stat = doc_file.stat()
+                except FileNotFoundError:
+                    continue
+                state[file_key(category_dir.name, doc_file.name)] = (stat.st_mtime_ns, stat.st_size)
+    return state
+
+
+class _ChangeSet:
+    """Keys changed since the last batch plus the time of the latest change"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = set()
+        self._last_change = 0.0
+
+    def add(self, key):
+        with self._lock:
+            self._keys.add(key)
+            self._last_change = time.monotonic()
+
+    def take_if_quiet(self, debounce):
+        with self._lock:
+            if not self._keys or time.monotonic() - self._last_change < debounce:
+                return None
+            keys, self._keys = self._keys, set()
+            return keys
+
+
+# Events that mean a document's content may have changed. inotify also reports
+# "opened" and "closed_no_write", which every sync's own reads would trigger again.
+_CHANGE_EVENTS = frozenset(("created", "modified", "deleted", "moved", "closed"))
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, doc_dir, changes):
+        self.doc_dir = doc_dir
+        self.changes = changes
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in _CHANGE_EVENTS:
+            return
+        for path in (event.src_path, getattr(event, "dest_path", None)):
+            key = document_key(self.doc_dir, path) if path else None
+            if key is not None:
+                self.changes.add(key)
+
+
+def watch_documents(doc_dir, on_change, debounce=1.0, poll_interval=1.0):
+    """
+    Call on_change(keys) with every set of changed document keys once no
+    further change has arrived for `debounce` seconds. A batch whose
+    on_change raises is logged and queued again. Runs until interrupted.
+    """
+    changes = _ChangeSet()
+
+    observer = None
+    if Observer is not None:
+        observer = Observer()
+        observer.schedule(_EventHandler(doc_dir, changes), str(doc_dir), recursive=True)
+        observer.start()
+        tick = min(0.1, debounce)
+    else:
+        previous = snapshot(doc_dir)
+        tick = poll_interval
+
+    try:
+        while True:
+            time.sleep(tick)
+
+            if observer is None:
+                current = snapshot(doc_dir)
+                for key in set(previous) | set(current):
+                    if previous.get(key) != current.get(key):
+                        changes.add(key)
+                previous = current
+
+            keys = changes.take_if_quiet(debounce)
+            if keys:
+                try:
+                    on_change(keys)
+                except Exception as e:
+                    # e.g. a file renamed away mid-sync by an editor's save: retry the batch
+                    print(f"⚠️ Sync of {len(keys)} file(s) failed, retrying: {e}")
+                    for key in keys:
+                        changes.add(key)
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def watch_backend():
+    """How changes are detected: filesystem events (inotify on Linux) or mtime polling"""
+    return "filesystem events" if Observer is not None else "mtime polling"
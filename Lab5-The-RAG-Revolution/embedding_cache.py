@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Persistent on-disk embedding cache
+Shared by Lab4 and Lab5 so identical text is never embedded twice by the same model
+"""
+
+import atexit
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# One cache directory shared by every lab script (override with EMBEDDING_CACHE_DIR)
+DEFAULT_CACHE_DIR = os.path.expanduser(os.getenv("EMBEDDING_CACHE_DIR", "~/.cache/techcorp-embeddings"))
+# Most rows the cache grows to before it starts evicting (about 190 MB of float16 vectors)
+DEFAULT_CAPACITY = int(os.getenv("EMBEDDING_CACHE_CAPACITY", "250000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    row INTEGER NOT NULL UNIQUE,
+    used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_by_use ON entries (used);
+CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY);
+"""
+
+# Files of the earlier fixed-size layout, removed when a cache directory is reset
+_LEGACY_FILES = ("vectors.npy", "keys.npy", "alloc.npy", "index.json")
+
+
+def cache_key(model_name, normalize, text):
+    """Cache key: (model name, normalization flag, sha256 of the text)"""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_name}|{int(bool(normalize))}|{text_hash}"
+
+
+def _fingerprint(key):
+    """128-bit fingerprint of a key, never all zero (zero marks a row as empty)"""
+    fingerprint = np.frombuffer(hashlib.sha256(key.encode("utf-8")).digest()[:16], dtype="<u8").copy()
+    fingerprint[0] |= 1
+    return fingerprint
+
+
+class EmbeddingCache:
+    """
+    Embedding store backed by a memory-mapped matrix that grows on demand.
+
+    vectors.bin holds one row of `dim` floats (float16 by default) per entry
+    and keys.bin the fingerprint of the key stored in each row. Both start
+    at INITIAL_ROWS rows and double as rows are taken, up to `capacity`;
+    then the least recently used entry is evicted and its row reused.
+    index.sqlite maps each key to its row and last use, so opening a cache
+    reads nothing up front and a flush writes only the changed entries.
+
+    Several processes (Lab4, Task 2, Task 5, rag_service.py) may share a
+    cache directory: rows are allocated and the files grown inside sqlite
+    write transactions, and a row is only served while its fingerprint
+    still matches the key, so a row another process is rewriting reads as
+    a miss. Within a process the cache is safe to share between threads.
+    """
+
+    FORMAT = 3
+    INITIAL_ROWS = 1024
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, dim=384, capacity=DEFAULT_CAPACITY, dtype="float16"):
+        self.cache_dir = cache_dir
+        self.dim = dim
+        self.capacity = max(1, capacity)
+        self.dtype = np.dtype(dtype)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._vectors_path = os.path.join(cache_dir, "vectors.bin")
+        self._keys_path = os.path.join(cache_dir, "keys.bin")
+        self._index_path = os.path.join(cache_dir, "index.sqlite")
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._touched = {}  # key -> last use, not yet written to index.sqlite
+        self._rows = 0
+        self._db().executescript(_SCHEMA)
+        with self._lock, self._transaction() as db:
+            self._open(db)
+
+        atexit.register(self.flush)
+
+    def _db(self):
+        """This thread's connection; transactions are begun explicitly"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self._index_path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction, exclusive across threads and processes until it commits"""
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def _layout(self):
+        return {"format": str(self.FORMAT), "dim": str(self.dim), "dtype": self.dtype.name}
+
+    @staticmethod
+    def _meta(db):
+        return dict(db.execute("SELECT name, value FROM meta"))
+
+    @staticmethod
+    def _set_meta(db, **values):
+        db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+
+    def _open(self, db):
+        meta = self._meta(db)
+        files = (self._vectors_path, self._keys_path)
+        if {name: meta.get(name) for name in self._layout()} == self._layout() and all(map(os.path.exists, files)):
+            self._map(int(meta["rows"]))
+            return
+
+        # Missing, or a different shape or precision: start a fresh cache
+        db.execute("DELETE FROM entries")
+        db.execute("DELETE FROM free_rows")
+        for name in _LEGACY_FILES:
+            path = os.path.join(self.cache_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
+        rows = min(self.INITIAL_ROWS, self.capacity)
+        for path in files:
+            open(path, "wb").close()
+        self._resize_files(rows)
+        self._set_meta(db, **self._layout(), rows=rows, next_row=0)
+        self._map(rows)
+
+    def _resize_files(self, rows):
+        os.truncate(self._vectors_path, rows * self.dim * self.dtype.itemsize)
+        os.truncate(self._keys_path, rows * 16)
+
+    def _map(self, rows):
+        self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(rows, self.dim))
+        self._keys = np.memmap(self._keys_path, dtype="<u8", mode="r+", shape=(rows, 2))
+        self._rows = rows
+
+    def _ensure_mapped(self, row, db):
+        """Remap after another process grew the files past this process's mapping"""
+        if row >= self._rows:
+            self._map(int(self._meta(db)["rows"]))
+        return row < self._rows
+
+    def _holds(self, row, fingerprint):
+        return bool((self._keys[row] == fingerprint).all())
+
+    def __len__(self):
+        return self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __contains__(self, key):
+        return self._db().execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def get(self, key):
+        """Return a copy of the cached vector for key, or None"""
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """Copies of the cached vectors for keys (None for a miss), with one index lookup per 500 keys"""
+        db = self._db()
+        rows = {}
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            rows.update(db.execute(
+                f"SELECT key, row FROM entries WHERE key IN ({', '.join('?' * len(batch))})", batch
+            ))
+
+        now = time.time()
+        vectors = []
+        with self._lock:
+            for key in keys:
+                row, vector = rows.get(key), None
+                if row is not None and self._ensure_mapped(row, db):
+                    fingerprint = _fingerprint(key)
+                    # Copied while the fingerprint is checked on both sides, so a
+                    # concurrent put to this row can't hand out a half-written vector
+                    if self._holds(row, fingerprint):
+                        vector = np.array(self._vectors[row])
+                        if not self._holds(row, fingerprint):
+                            vector = None
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self._touched[key] = now
+                vectors.append(vector)
+        return vectors
+
+    def _write_touched(self, db):
+        if self._touched:
+            db.executemany("UPDATE entries SET used = ? WHERE key = ?",
+                           [(used, key) for key, used in self._touched.items()])
+            self._touched.clear()
+
+    def _allocate(self, db):
+        """A row for a new key: a freed row, an unused one, a new one, or the least recently used"""
+        free = db.execute("SELECT row FROM free_rows LIMIT 1").fetchone()
+        if free is not None:
+            db.execute("DELETE FROM free_rows WHERE row = ?", free)
+            return free[0]
+
+        meta = self._meta(db)
+        rows, next_row = int(meta["rows"]), int(meta["next_row"])
+        if next_row >= rows and rows < self.capacity:
+            rows = min(rows * 2, self.capacity)
+            self._resize_files(rows)
+            self._set_meta(db, rows=rows)
+            self._map(rows)
+        if next_row < rows:
+            self._set_meta(db, next_row=next_row + 1)
+            return next_row
+
+        key, row = db.execute("SELECT key, row FROM entries ORDER BY used LIMIT 1").fetchone()
+        db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self.evictions += 1
+        return row
+
+    def put(self, key, vector):
+        """Store a vector, evicting the least recently used entry when full"""
+        self.put_many([(key, vector)])
+
+    def put_many(self, items):
+        """Store (key, vector) pairs in one transaction"""
+        now = time.time()
+        with self._lock, self._transaction() as db:
+            # Recent hits first, so eviction doesn't pick an entry that was just used
+            self._write_touched(db)
+            for key, vector in items:
+                found = db.execute("SELECT row FROM entries WHERE key = ?", (key,)).fetchone()
+                row = found[0] if found is not None else self._allocate(db)
+                self._ensure_mapped(row, db)
+
+                self._keys[row] = 0
+                self._vectors[row] = vector
+                self._keys[row] = _fingerprint(key)
+                db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, row, now))
+
+    def discard(self, key):
+        """Drop a key and free its row"""
+        with self._lock, self._transaction() as db:
+            found = db.execute("SELECT row FROM entries WHERE key = ?", (key,)).fetchone()
+            if found is None:
+                return
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            if self._ensure_mapped(found[0], db):
+                self._keys[found[0]] = 0
+            db.execute("INSERT OR IGNORE INTO free_rows VALUES (?)", found)
+
+    def flush(self):
+        """Persist the vectors and the last-use times of hits (called automatically at exit)"""
+        with self._lock:
+            self._vectors.flush()
+            self._keys.flush()
+            if self._touched:
+                with self._transaction() as db:
+                    self._write_touched(db)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "capacity": self.capacity,
+            "rows": self._rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+def _cached_embed(cache, model_name, normalize, texts, embed_missing):
+    """
+    Look every text up in the cache and embed only the misses (each distinct
+    missing text once) with embed_missing(list_of_texts) -> 2D array.
+    """
+    out = np.empty((len(texts), cache.dim), dtype=np.float32)
+    missing = OrderedDict()  # key -> positions in texts
+
+    keys = [cache_key(model_name, normalize, text) for text in texts]
+    for i, (key, vector) in enumerate(zip(keys, cache.get_many(keys))):
+        if vector is None:
+            missing.setdefault(key, []).append(i)
+        else:
+            out[i] = vector
+
+    if missing:
+        new_vectors = np.asarray(
+            embed_missing([texts[positions[0]] for positions in missing.values()]),
+            dtype=np.float32
+        )
+        cache.put_many(zip(missing, new_vectors))
+        for positions, vector in zip(missing.values(), new_vectors):
+            out[positions] = vector
+
+    return out
+
+
+class CachedEncoder:
+    """
+    Drop-in wrapper for SentenceTransformer whose encode() serves repeated
+    texts from an EmbeddingCache. Every other attribute is forwarded.
+    """
+
+    def __init__(self, model, model_name, cache=None):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache if cache is not None else EmbeddingCache(
+            dim=model.get_sentence_embedding_dimension()
+        )
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        # The cache always hands back numpy arrays
+        kwargs.pop("convert_to_numpy", None)
+        kwargs.pop("convert_to_tensor", None)
+
+        embeddings = _cached_embed(
+            self.cache, self.model_name, normalize_embeddings, texts,
+            lambda missing: self.model.encode(
+                missing,
+                batch_size=batch_size,
+                normalize_embeddings=normalize_embeddings,
+                convert_to_numpy=True,
+                **kwargs
+            )
+        )
+        return embeddings[0] if single else embeddings
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper (e.g. around HuggingFaceEmbeddings) backed by an EmbeddingCache"""
+
+    def __init__(self, embeddings, model_name, normalize, cache=None, dim=384):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.normalize = normalize
+        self.cache = cache if cache is not None else EmbeddingCache(dim=dim)
+
+    def embed_documents(self, texts):
+        return _cached_embed(
+            self.cache, self.model_name, self.normalize, list(texts), self.embeddings.embed_documents
+        ).tolist()
+
+    def embed_query(self, text):
+        return _cached_embed(
+            self.cache, self.model_name, self.normalize, [text],
+            lambda missing: [self.embeddings.embed_query(missing[0])]
+        )[0].tolist()
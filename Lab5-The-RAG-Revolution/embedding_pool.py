@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Multi-core embedding worker pool
+Shards encode() batches across worker processes, each with its own model copy
+and a pinned torch thread count, and reassembles the results in order
+"""
+
+import math
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+_worker_model = None
+
+
+def _init_worker(model_name, threads, next_index, cores):
+    """Load the model once per worker and pin it to its own slice of cores"""
+    global _worker_model
+
+    with next_index.get_lock():
+        index = next_index.value
+        next_index.value += 1
+
+    if hasattr(os, "sched_setaffinity") and cores:
+        start = (index * threads) % len(cores)
+        os.sched_setaffinity(0, set(cores[start:start + threads]) or set(cores))
+
+    import torch
+    from onnx_encoder import load_encoder
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    # Honours EMBEDDING_BACKEND, so workers can run the int8 ONNX model too
+    _worker_model = load_encoder(model_name)
+
+
+def _encode_shard(args):
+    texts, batch_size, normalize = args
+    return _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        normalize_embeddings=normalize,
+        convert_to_numpy=True
+    )
+
+
+def _dimension(_):
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _pool_context():
+    # Fork so workers never re-run the calling script. Create pools before the
+    # parent runs any torch computation: forking a process whose OpenMP thread
+    # pool is already live is not safe.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+class EmbeddingPool:
+    """
+    Drop-in for SentenceTransformer.encode backed by `workers` processes
+    running `threads_per_worker` torch threads each.
+    """
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", workers=None, threads_per_worker=None, batch_size=64):
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+
+        self.model_name = model_name
+        self.workers = workers or max(1, len(cores) // 4)
+        self.threads_per_worker = threads_per_worker or max(1, len(cores) // self.workers)
+        self.batch_size = batch_size
+
+        # Export the quantized model once here rather than racing in every worker
+        from onnx_encoder import EMBEDDING_BACKEND, export_quantized_model
+        if EMBEDDING_BACKEND == "onnx-int8":
+            export_quantized_model(model_name)
+
+        ctx = _pool_context()
+        self._pool = ctx.Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(model_name, self.threads_per_worker, ctx.Value("i", 0), cores)
+        )
+        self._dimension = self._pool.apply(_dimension, (None,))
+
+    def get_sentence_embedding_dimension(self):
+        return self._dimension
+
+    def encode(self, sentences, batch_size=None, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        batch_size = batch_size or self.batch_size
+
+        if not texts:
+            return np.empty((0, self._dimension), dtype=np.float32)
+
+        # One shard per model batch; map() keeps results in input order
+        shards = [(texts[i:i + batch_size], batch_size, normalize_embeddings)
+                  for i in range(0, len(texts), batch_size)]
+        embeddings = np.vstack(self._pool.map(_encode_shard, shards, chunksize=1))
+        return embeddings[0] if single else embeddings
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def autotune(cls, model_name, sample_texts, batch_sizes=(32, 128), verbose=True):
+        """
+        Time a short calibration run for each workers x threads x batch size
+        layout that fits the available cores and return a pool using the
+        fastest one.
+        """
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        worker_counts = sorted({2 ** p for p in range(int(math.log2(cores)) + 1)})
+
+        best = None
+        for workers in worker_counts:
+            threads = max(1, cores // workers)
+            for batch_size in batch_sizes:
+                with cls(model_name, workers, threads, batch_size) as pool:
+                    pool.encode(sample_texts[:batch_size * workers])  # warm up every worker
+                    start = time.perf_counter()
+                    pool.encode(sample_texts)
+                    rate = len(sample_texts) / (time.perf_counter() - start)
+
+                if verbose:
+                    print(f"   ⚙️ workers={workers} threads={threads} batch={batch_size}: {rate:.0f} texts/sec")
+                if best is None or rate > best[0]:
+                    best = (rate, workers, threads, batch_size)
+
+        _, workers, threads, batch_size = best
+        if verbose:
+            print(f"   ✅ Selected workers={workers} threads={threads} batch={batch_size}")
+        return cls(model_name, workers, threads, batch_size)
+
+
+class PooledEmbeddings(Embeddings):
+    """LangChain Embeddings backed by an EmbeddingPool"""
+
+    def __init__(self, pool, normalize=True):
+        self.pool = pool
+        self.normalize = normalize
+
+    def embed_documents(self, texts):
+        return self.pool.encode(list(texts), normalize_embeddings=self.normalize).tolist()
+
+    def embed_query(self, text):
+        return self.pool.encode(text, normalize_embeddings=self.normalize).tolist()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Precomputed FAQ answer index
+Recurring questions are answered offline; a near-identical question is served by one embedding lookup
+"""
+
+import io
+import json
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+from answer_cache import ChunkVersions
+
+# Written by build_faq_index.py next to ./chroma_db
+FAQ_INDEX_PATH = "./faq_index.npz"
+
+
+def normalize_question(question):
+    """Key used to count repeats of a question: case, spacing and trailing punctuation ignored"""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def mine_questions(log_path="./rag_requests.jsonl", top=300, min_count=2):
+    """
+    Most frequent live questions in Task 5's request log, as
+    [(question, times asked)]. Fallback answers are not counted (the
+    handbook has nothing for them); the first spelling seen is kept.
+    """
+    counts, spelling = Counter(), {}
+    with open(log_path, "r") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            question = event.get("question")
+            if not question or event.get("outcome") not in ("llm", "cache", "faq"):
+                continue
+            key = normalize_question(question)
+            counts[key] += 1
+            spelling.setdefault(key, question.strip())
+
+    return [(spelling[key], n) for key, n in counts.most_common(top) if n >= min_count]
+
+
+def save_faq_index(entries, embeddings, path=FAQ_INDEX_PATH, dim=384):
+    """
+    Write entries (dicts with question, answer, chunks {id: sha256} and
+    asked) and their question embeddings as one .npz, atomically. Vectors
+    are stored as float16 unit rows: a few hundred questions stay well
+    under a megabyte. dim only shapes the (0, dim) array of an empty index.
+    """
+    if len(entries):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(entries), -1)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    else:
+        # Every question fell back (or every entry went stale): an empty but well-formed index
+        vectors = np.empty((0, dim), dtype=np.float32)
+
+    buffer = io.BytesIO()
+    np.savez(buffer, vectors=vectors.astype(np.float16), entries=np.array(json.dumps(entries)))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(tmp_path, path)
+
+
+class FaqIndex:
+    """
+    Answers precomputed for frequent questions, keyed by question embedding.
+
+    lookup() serves the nearest entry whose cosine similarity to the
+    question is at least min_similarity, unless one of the chunks its
+    answer was generated from has been re-ingested with different text
+    since; such stale entries are skipped until they are rebuilt.
+    """
+
+    def __init__(self, path=FAQ_INDEX_PATH, min_similarity=0.95, versions=None):
+        self.path = path
+        self.min_similarity = min_similarity
+        self.versions = versions if versions is not None else ChunkVersions()
+        self.hits = 0
+        self.misses = 0
+        self.stale_skips = 0
+
+        self._mtime = None
+        self._state = ([], np.empty((0, 0), dtype=np.float32))
+        self._lock = threading.Lock()
+        self.reload_if_changed()
+
+    @staticmethod
+    def exists(path=FAQ_INDEX_PATH):
+        return os.path.exists(path)
+
+    def reload_if_changed(self):
+        """Pick up an index build_faq_index.py rewrote since it was loaded"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with np.load(self.path) as data:
+                entries = json.loads(str(data["entries"]))
+                vectors = data["vectors"].astype(np.float32)
+            self._state = (entries, vectors)
+            self._mtime = mtime
+
+    @property
+    def entries(self):
+        return list(self._state[0])
+
+    def __len__(self):
+        return len(self._state[0])
+
+    def snapshot(self):
+        """(entries, float32 unit question vectors) as currently loaded"""
+        entries, vectors = self._state
+        return list(entries), vectors
+
+    def is_current(self, entry, versions=None):
+        versions = versions if versions is not None else self.versions.current()
+        return all(versions.get(cid) == text_hash for cid, text_hash in entry["chunks"].items())
+
+    def lookup(self, query_embedding):
+        """The precomputed entry answering this question embedding, or None"""
+        entries, vectors = self._state
+        if not entries:
+            self.misses += 1
+            return None
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        similarities = vectors @ query / max(float(np.linalg.norm(query)), 1e-12)
+        candidates = np.flatnonzero(similarities >= self.min_similarity)
+        if len(candidates):
+            versions = self.versions.current()
+            for row in candidates[np.argsort(-similarities[candidates])]:
+                entry = entries[row]
+                if self.is_current(entry, versions):
+                    self.hits += 1
+                    return entry
+                self.stale_skips += 1
+
+        self.misses += 1
+        return None
+
+    def stale_entries(self):
+        """Entries whose source chunks were re-ingested (or removed) since they were built"""
+        versions = self.versions.current()
+        return [entry for entry in self._state[0] if not self.is_current(entry, versions)]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_skips": self.stale_skips,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
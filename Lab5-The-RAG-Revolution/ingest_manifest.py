@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Ingestion manifest for incremental re-indexing
+Records per-file and per-chunk content hashes so Task 2 only re-embeds what changed
+"""
+
+import hashlib
+import json
+import os
+
+# Stored next to ./chroma_db so both move together
+MANIFEST_PATH = "./ingest_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def hash_text(text):
+    """sha256 of a chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(path, block_size=1 << 20):
+    """sha256 of a file's bytes, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_key(section, file_name):
+    """Manifest key for a document: '<section>/<file name>'"""
+    return f"{section}/{file_name}"
+
+
+def chunk_id(section, stem, index):
+    """Deterministic Chroma id of a chunk (same scheme Task 2 has always used)"""
+    return f"{section}_{stem}_chunk_{index}"
+
+
+def empty_manifest():
+    return {"version": MANIFEST_VERSION, "files": {}, "duplicates": {}}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Load the manifest, or an empty one if missing or from another version"""
+    if not os.path.exists(path):
+        return empty_manifest()
+
+    with open(path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return empty_manifest()
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Write the manifest atomically so a crash never leaves it half-written"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def entry_chunk_ids(entry):
+    """All chunk ids currently stored for a manifest entry"""
+    return [chunk_id(entry["section"], entry["stem"], i) for i in range(len(entry["chunks"]))]
+
+
+def chunk_hashes(manifest):
+    """Map every chunk id in the manifest to the sha256 of its text"""
+    return {
+        cid: text_hash
+        for entry in manifest["files"].values()
+        for cid, text_hash in zip(entry_chunk_ids(entry), entry["chunks"])
+    }
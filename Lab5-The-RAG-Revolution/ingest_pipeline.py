@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Producer stage for Task 2 ingestion
+Walks the category directories, reads and chunks files in a process pool and
+streams (id, text, metadata, parts) records, and optionally the paragraphs they
+were chunked from, into a bounded queue for the embedding stage
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from chunking import process_document, stream_document
+from ingest_manifest import file_key
+
+# Queue item kinds
+RECORD = "record"    # payload: (chunk_id, text, metadata, paragraph parts or None)
+PARAGRAPH = "para"   # payload: (file key, paragraph text), in order, before the file's FILE_DONE
+FILE_DONE = "file"   # payload: (file key, process_document result or None if unchanged)
+DONE = "done"        # payload: exception raised by the producer, or None
+
+
+def list_document_tasks(doc_dir, manifest, only_keys=None):
+    """
+    (key, task) for every *.md file (or only those in only_keys), using a
+    snapshot of the manifest entries
+    """
+    tasks = []
+    for category_dir in sorted(doc_dir.iterdir()):
+        if category_dir.is_dir():
+            for doc_file in sorted(category_dir.glob("*.md")):
+                key = file_key(category_dir.name, doc_file.name)
+                if only_keys is not None and key not in only_keys:
+                    continue
+                tasks.append((key, (doc_file, category_dir.name, manifest["files"].get(key))))
+    return tasks
+
+
+class _Cancelled(Exception):
+    """The consumer stopped reading the queue"""
+
+
+def _putter(out_queue, cancel):
+    """out_queue.put that gives up once cancel is set instead of blocking on a full queue forever"""
+    def put(item):
+        while True:
+            if cancel.is_set():
+                raise _Cancelled()
+            try:
+                out_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+    return put
+
+
+def _emit(put, key, result):
+    if result is not None:
+        for paragraph in result.pop("paragraphs", ()):
+            put((PARAGRAPH, (key, paragraph)))
+        for record in result.pop("records", ()):
+            put((RECORD, record))
+    put((FILE_DONE, (key, result)))
+
+
+def _stream(put, key, task, with_parts, with_paragraphs, chunker=None, make_metadata=None):
+    # Records go straight into the bounded queue, so a huge file never has
+    # more than a paragraph window plus the queue in memory
+    on_paragraph = (lambda paragraph: put((PARAGRAPH, (key, paragraph)))) if with_paragraphs else None
+    result = stream_document(
+        task, with_parts, lambda record: put((RECORD, record)), on_paragraph, chunker, make_metadata
+    )
+    put((FILE_DONE, (key, result)))
+
+
+def _pool_context():
+    # Workers only do string work, so forking the already-loaded parent is
+    # cheap and never re-runs the calling script the way spawn would
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+def _produce(tasks, put, cancel, workers, with_parts, stream_bytes, with_paragraphs, chunker, make_metadata):
+    try:
+        if workers <= 0:
+            for key, task in tasks:
+                # A chunker needs the whole text: files of stream_bytes or more keep the streaming one
+                small = os.path.getsize(task[0]) < stream_bytes
+                _stream(put, key, task, with_parts, with_paragraphs, chunker if small else None, make_metadata)
+        else:
+            # Keep a couple of files per worker in flight so results stream
+            # out as they finish instead of all at the end
+            max_in_flight = workers * 2
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context())
+            try:
+                in_flight = {}
+                for key, task in tasks:
+                    if os.path.getsize(task[0]) >= stream_bytes:
+                        _stream(put, key, task, with_parts, with_paragraphs, None, make_metadata)
+                        continue
+
+                    in_flight[pool.submit(
+                        process_document, task, with_parts, with_paragraphs, chunker, make_metadata
+                    )] = key
+                    if len(in_flight) >= max_in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            _emit(put, in_flight.pop(future), future.result())
+
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        _emit(put, in_flight.pop(future), future.result())
+            finally:
+                # A cancelled run drops the files not started yet
+                pool.shutdown(wait=True, cancel_futures=cancel.is_set())
+
+        put((DONE, None))
+    except _Cancelled:
+        pass
+    except BaseException as e:
+        try:
+            put((DONE, e))
+        except _Cancelled:
+            pass
+
+
+def start_producer(doc_dir, manifest, workers, queue_size=1024, with_parts=False, stream_bytes=32 << 20,
+                   only_keys=None, with_paragraphs=False, chunker=None, make_metadata=None):
+    """
+    Start chunking in the background.
+
+    Returns (out_queue, keys, stop): the bounded queue the consumer drains
+    until a DONE item arrives, the manifest keys of every file that was
+    found, and a function that cancels the producer and waits for it (for
+    a consumer that gives up before DONE; it is a no-op after DONE).
+    workers=0 chunks in the producer thread without a process pool.
+    with_parts attaches each chunk's paragraph layout to its record.
+    Files of stream_bytes or more skip the pool (whose results are whole
+    lists) and are streamed paragraph by paragraph into the queue.
+    only_keys restricts the walk to those manifest keys.
+    with_paragraphs also queues every paragraph of each changed file, from
+    the same read its chunks come from, ahead of the file's FILE_DONE.
+    chunker and make_metadata are passed on to stream_document (they must
+    be picklable module-level functions); files of stream_bytes or more are
+    still chunked by the streaming smart_chunk_document.
+    """
+    tasks = list_document_tasks(doc_dir, manifest, only_keys)
+    out_queue = queue.Queue(maxsize=queue_size)
+    cancel = threading.Event()
+
+    producer = threading.Thread(
+        target=_produce,
+        args=(tasks, _putter(out_queue, cancel), cancel, workers, with_parts, stream_bytes, with_paragraphs,
+              chunker, make_metadata),
+        daemon=True
+    )
+    producer.start()
+
+    def stop():
+        cancel.set()
+        producer.join()
+
+    return out_queue, [key for key, _ in tasks], stop
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Load test for the async RAG pipeline
+Reports throughput and p50/p99 latency at 1, 10 and 100 concurrent users
+
+Usage: python3 load_test_rag.py [users ...]   (default: 1 10 100)
+
+The handful of questions repeat, so the answer cache and FAQ index are off
+unless ANSWER_CACHE / RAG_FAQ are set explicitly; otherwise most requests
+would time a cache lookup instead of retrieval and generation.
+"""
+
+import asyncio
+import math
+import os
+import sys
+import time
+from collections import Counter
+
+# Before task_5_complete_rag reads them at import
+os.environ.setdefault("ANSWER_CACHE", "0")
+os.environ.setdefault("RAG_FAQ", "0")
+
+from micro_batcher import MicroBatchEncoder
+from task_5_complete_rag import metrics, model, run_rag_pipeline_async
+
+QUESTIONS = [
+    "Can I bring my dog to the office?",
+    "How many vacation days do I get?",
+    "What is the remote work policy?",
+    "Is VPN required when working from home?",
+    "How do I reset my password?"
+]
+
+REQUESTS_PER_USER = int(os.getenv("LOAD_TEST_REQUESTS_PER_USER", "5"))
+
+
+def percentile(values, p):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+async def simulated_user(user_id, latencies, errors, outcomes):
+    """One user asking REQUESTS_PER_USER questions back to back"""
+    for i in range(REQUESTS_PER_USER):
+        question = QUESTIONS[(user_id + i) % len(QUESTIONS)]
+        start = time.perf_counter()
+        try:
+            # rag_pipeline_async's body, keeping the outcome (llm, fallback, cache, faq)
+            trace = metrics.trace(question)
+            _, outcome = await run_rag_pipeline_async(question, trace)
+            trace.finish(outcome)
+            latencies.append(time.perf_counter() - start)
+            outcomes[outcome] += 1
+        except Exception:
+            errors.append(question)
+
+
+async def run_level(users):
+    latencies, errors, outcomes = [], [], Counter()
+    start = time.perf_counter()
+    await asyncio.gather(*(simulated_user(u, latencies, errors, outcomes) for u in range(users)))
+    elapsed = time.perf_counter() - start
+    return latencies, errors, outcomes, elapsed
+
+
+async def run_all(levels):
+    # One event loop for every level so the LLM client's connection pool is reused
+    return [(users, await run_level(users)) for users in levels]
+
+
+def main():
+    levels = [int(arg) for arg in sys.argv[1:]] or [1, 10, 100]
+    results = asyncio.run(run_all(levels))
+
+    print("\n📈 RAG Load Test")
+    print("=" * 60)
+    print(f"{'users':>6} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 (s)':>9} {'p99 (s)':>9}  outcomes")
+    print("-" * 60)
+
+    for users, (latencies, errors, outcomes, elapsed) in results:
+        if not latencies:
+            print(f"{users:>6} {0:>9} {len(errors):>7}        -         -         -")
+            continue
+
+        print(f"{users:>6} {len(latencies):>9} {len(errors):>7} "
+              f"{len(latencies) / elapsed:>8.2f} "
+              f"{percentile(latencies, 50):>9.3f} {percentile(latencies, 99):>9.3f}  "
+              + ", ".join(f"{name} {n}" for name, n in outcomes.most_common()))
+
+    print("=" * 60)
+
+    if isinstance(model, MicroBatchEncoder):
+        stats = model.stats()
+        print(f"📦 Query encoder: {stats['items']} questions in {stats['batches']} batches "
+              f"(mean batch size {stats['mean_batch_size']:.1f}, max {stats['max_batch_size']})")
+        print(f"   Batch sizes: {stats['batch_sizes']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Micro-batching query encoder
+Concurrent single-question encode() calls share one forward pass
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatchEncoder:
+    """
+    Drop-in wrapper for the Task 5 encoder. encode(str) queues the text;
+    one background thread gathers queued texts for up to max_wait_ms or
+    max_batch items, encodes them with a single model.encode call and
+    resolves each caller's future with its row.
+
+    The wait is adaptive: a lone caller (the previous batch had one item
+    and nothing else is queued) is encoded immediately, so sequential use
+    pays no extra latency. Lists and calls with extra keyword arguments
+    go straight to the wrapped model.
+    """
+
+    def __init__(self, model, max_batch=32, max_wait_ms=3.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = {}  # batch size -> number of batches
+
+        self._queue = queue.Queue()
+        self._last_batch_size = 1
+        self._thread = threading.Thread(target=self._run, name="query-encoder", daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        """Queue one text; the Future resolves to its embedding row"""
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, sentences, **kwargs):
+        if isinstance(sentences, str) and not kwargs:
+            return self.submit(sentences).result()
+        return self.model.encode(sentences, **kwargs)
+
+    def _gather(self):
+        batch = [self._queue.get()]
+        wait = self.max_wait if self._last_batch_size > 1 or not self._queue.empty() else 0.0
+        deadline = time.perf_counter() + wait
+
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._gather()
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.model.encode(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self._last_batch_size = len(batch)
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": max(self.batch_sizes, default=0),
+            "batch_sizes": dict(sorted(self.batch_sizes.items()))
+        }
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Selectable encoder backend: fp32 PyTorch or int8-quantized ONNX on CPU
+The ONNX model is still a SentenceTransformer, so encode()/embed_documents work unchanged
+
+Run directly to export the quantized model and check parity against fp32:
+    python3 onnx_encoder.py
+"""
+
+import os
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+# EMBEDDING_BACKEND=onnx-int8 switches every Lab4/Lab5 script to the quantized model
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Match the CPU: avx2, avx512, avx512_vnni or arm64
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+ONNX_MODEL_DIR = os.path.expanduser(os.getenv("ONNX_MODEL_DIR", "~/.cache/techcorp-onnx"))
+
+
+def quantized_model_dir(model_name):
+    return os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "__"))
+
+
+def quantized_file_suffix():
+    # Passed to the export explicitly: left to itself it names the file after the
+    # config's weight dtype (model_quint8_avx2.onnx for avx2), not after "qint8"
+    return f"qint8_{ONNX_QUANTIZATION}"
+
+
+def quantized_file_name():
+    return f"onnx/model_{quantized_file_suffix()}.onnx"
+
+
+def onnx_model_kwargs():
+    """SentenceTransformer kwargs (also usable as HuggingFaceEmbeddings model_kwargs)"""
+    return {
+        "device": "cpu",
+        "backend": "onnx",
+        "model_kwargs": {"file_name": quantized_file_name(), "provider": "CPUExecutionProvider"}
+    }
+
+
+def export_quantized_model(model_name):
+    """Export model_name to ONNX with dynamic int8 quantization (once) and return its directory"""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_dir = quantized_model_dir(model_name)
+    if os.path.exists(os.path.join(export_dir, quantized_file_name())):
+        return export_dir
+
+    print(f"⚙️ Exporting {model_name} to int8 ONNX ({ONNX_QUANTIZATION})...")
+    fp32_onnx = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    fp32_onnx.save_pretrained(export_dir)
+    export_dynamic_quantized_onnx_model(
+        fp32_onnx, ONNX_QUANTIZATION, export_dir, file_suffix=quantized_file_suffix()
+    )
+    return export_dir
+
+
+def encoder_cache_name(model_name, backend=None):
+    """Model identity for the embedding cache; quantized vectors must not mix with fp32 ones"""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx-int8":
+        return f"{model_name}+onnx-qint8-{ONNX_QUANTIZATION}"
+    return model_name
+
+
+def load_encoder(model_name="all-MiniLM-L6-v2", backend=None):
+    """SentenceTransformer for the selected backend ("torch" or "onnx-int8")"""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "onnx-int8":
+        return SentenceTransformer(export_quantized_model(model_name), **onnx_model_kwargs())
+    if backend != "torch":
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {backend}")
+    return SentenceTransformer(model_name)
+
+
+def parity_check(model_name, queries, documents, tolerance=0.02):
+    """
+    Compare query-document cosine scores of the int8 ONNX model with the fp32
+    model. Returns the stats and whether the largest score difference is
+    within tolerance and every query keeps its top-1 document.
+    """
+    reference = load_encoder(model_name, backend="torch")
+    quantized = load_encoder(model_name, backend="onnx-int8")
+
+    results = {}
+    for name, encoder in (("fp32", reference), ("int8", quantized)):
+        encoder.encode(queries)  # warm up
+        start = time.perf_counter()
+        q = encoder.encode(queries, normalize_embeddings=True, convert_to_numpy=True)
+        d = encoder.encode(documents, normalize_embeddings=True, convert_to_numpy=True)
+        elapsed = time.perf_counter() - start
+        results[name] = (q @ d.T, elapsed)
+
+    ref_scores, ref_time = results["fp32"]
+    q8_scores, q8_time = results["int8"]
+    max_diff = float(np.max(np.abs(ref_scores - q8_scores)))
+    same_top1 = bool(np.all(ref_scores.argmax(axis=1) == q8_scores.argmax(axis=1)))
+
+    return {
+        "max_score_diff": max_diff,
+        "mean_score_diff": float(np.mean(np.abs(ref_scores - q8_scores))),
+        "same_top1": same_top1,
+        "fp32_seconds": ref_time,
+        "int8_seconds": q8_time,
+        "passed": max_diff <= tolerance and same_top1
+    }
+
+
+def main():
+    queries = [
+        "forgot my password",
+        "Can I work from home?",
+        "How many vacation days do I get?",
+        "retirement savings"
+    ]
+    documents = [
+        "Password recovery: Use the 'Reset Password' link on login page",
+        "Remote work policy allows employees to work from home up to 3 days per week with manager approval.",
+        "Vacation policy provides 15 days PTO first year, increasing to 20 days after 2 years.",
+        "401k retirement plan includes company match up to 6% of salary.",
+        "Dress code is business casual Monday-Thursday. Jeans are permitted on Fridays only."
+    ]
+
+    print("🧪 ONNX int8 Parity Check")
+    print("=" * 50)
+    report = parity_check("all-MiniLM-L6-v2", queries, documents)
+    print(f"   - Max cosine difference:  {report['max_score_diff']:.4f}")
+    print(f"   - Mean cosine difference: {report['mean_score_diff']:.4f}")
+    print(f"   - Same top-1 document:    {report['same_top1']}")
+    print(f"   - fp32 encode time:       {report['fp32_seconds'] * 1000:.1f} ms")
+    print(f"   - int8 encode time:       {report['int8_seconds'] * 1000:.1f} ms")
+    print("=" * 50)
+    print("✅ Parity check passed" if report["passed"] else "❌ Parity check failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Paragraph-embedding reuse for overlapping chunks
+Every smart chunk is built from 2-3 paragraphs, so encode each paragraph once
+and compose chunk vectors as length-weighted means of paragraph vectors
+"""
+
+import numpy as np
+
+
+def compose_chunk_embeddings(model, parts_list, batch_size=64):
+    """
+    Embed chunks from their paragraph layouts (see chunking.smart_chunk_parts).
+
+    Each distinct paragraph in parts_list is encoded once; a chunk's vector is
+    the mean of its paragraph vectors weighted by the characters each
+    contributes, re-normalized to unit length.
+    Returns (embeddings, paragraphs_encoded).
+    """
+    paragraph_rows = {}
+    for parts in parts_list:
+        for text, _ in parts:
+            paragraph_rows.setdefault(text, len(paragraph_rows))
+
+    paragraph_vectors = np.asarray(
+        model.encode(
+            list(paragraph_rows),
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        ),
+        dtype=np.float32
+    )
+
+    embeddings = np.zeros((len(parts_list), paragraph_vectors.shape[1]), dtype=np.float32)
+    for i, parts in enumerate(parts_list):
+        rows = [paragraph_rows[text] for text, _ in parts]
+        weights = np.array([chars for _, chars in parts], dtype=np.float32)
+        if weights.sum() == 0:
+            weights[:] = 1.0
+        embeddings[i] = weights @ paragraph_vectors[rows]
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    embeddings /= np.maximum(norms, 1e-12)
+    return embeddings, len(paragraph_rows)
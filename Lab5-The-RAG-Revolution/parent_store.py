@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Parent paragraph store for parent/child retrieval
+Chunks stay the small units that are matched; their paragraphs are stored once and
+adjacent hits from the same file are merged into one contiguous span before prompting
+"""
+
+import sqlite3
+import threading
+
+# Written by Task 2 next to ./chroma_db
+PARENT_STORE_PATH = "./parent_store.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paragraphs (
+    doc TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (doc, idx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL,
+    first INTEGER NOT NULL,
+    last INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chunks_by_doc ON chunks (doc);
+"""
+
+
+def chunk_span(index, paragraph_count):
+    """
+    Paragraphs a smart_chunk_document window stands for: its own paragraph
+    and the next one (the overlap tail of the previous paragraph is context,
+    not content).
+    """
+    return index, min(index + 1, paragraph_count - 1)
+
+
+class ParentStore:
+    """
+    sqlite side store: every document's paragraphs once, plus each chunk
+    id's paragraph span. Connections are per thread, so one store can be
+    shared by the threaded pipelines.
+    """
+
+    def __init__(self, path=PARENT_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path)
+            self._local.db = db
+        return db
+
+    def has_document(self, doc):
+        return self._db().execute("SELECT 1 FROM chunks WHERE doc = ? LIMIT 1", (doc,)).fetchone() is not None
+
+    def replace_document(self, doc, paragraphs, chunk_ids):
+        """Store a document's paragraphs and its chunk spans, replacing any older version"""
+        self.start_document(doc)
+        self.add_paragraphs(doc, paragraphs)
+        self.finish_document(doc, chunk_ids)
+
+    def start_document(self, doc):
+        """
+        Begin replacing a document: add_paragraphs() and finish_document()
+        on the same thread complete it as one transaction, so readers see
+        the old version until it commits.
+        """
+        self._db().execute("DELETE FROM paragraphs WHERE doc = ?", (doc,))
+        self._db().execute("DELETE FROM chunks WHERE doc = ?", (doc,))
+        self._local.next_idx = 0
+
+    def add_paragraphs(self, doc, paragraphs):
+        """Insert the document's next paragraphs as they are read (any iterable)"""
+        rows = ((doc, i, text) for i, text in enumerate(paragraphs, self._local.next_idx))
+        self._local.next_idx += self._db().executemany(
+            "INSERT INTO paragraphs (doc, idx, text) VALUES (?, ?, ?)", rows
+        ).rowcount
+
+    def finish_document(self, doc, chunk_ids):
+        """Store the chunk spans and commit; there is one paragraph per chunk"""
+        chunk_ids = list(chunk_ids)
+        with self._db() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, doc, first, last) VALUES (?, ?, ?, ?)",
+                ((cid, doc, *chunk_span(i, len(chunk_ids))) for i, cid in enumerate(chunk_ids))
+            )
+
+    def discard(self):
+        """Roll back a document replacement that will not be finished"""
+        self._db().rollback()
+
+    def clear(self):
+        with self._db() as db:
+            db.execute("DELETE FROM paragraphs")
+            db.execute("DELETE FROM chunks")
+
+    def remove_document(self, doc):
+        with self._db() as db:
+            db.execute("DELETE FROM paragraphs WHERE doc = ?", (doc,))
+            db.execute("DELETE FROM chunks WHERE doc = ?", (doc,))
+
+    def merge_hits(self, chunk_ids, chunks):
+        """
+        Context texts for best-first hits: hits from the same document whose
+        spans overlap or touch become one contiguous paragraph span, placed
+        at the rank of its best hit. Unknown ids keep their chunk text.
+        Returns (texts, hits merged away).
+        """
+        if not chunk_ids:
+            return [], 0
+
+        db = self._db()
+        placeholders = ",".join("?" * len(chunk_ids))
+        spans = {
+            cid: (doc, first, last)
+            for cid, doc, first, last in db.execute(
+                f"SELECT chunk_id, doc, first, last FROM chunks WHERE chunk_id IN ({placeholders})",
+                list(chunk_ids)
+            )
+        }
+
+        groups = []  # [doc or None, first, last, chunk text] in rank order
+        for cid, chunk in zip(chunk_ids, chunks):
+            if cid not in spans:
+                groups.append([None, 0, 0, chunk])
+                continue
+
+            doc, first, last = spans[cid]
+            for group in groups:
+                if group[0] == doc and first <= group[2] + 1 and last >= group[1] - 1:
+                    group[1], group[2] = min(group[1], first), max(group[2], last)
+                    break
+            else:
+                groups.append([doc, first, last, chunk])
+
+        # Two spans of one document can touch only after both grew: merge until stable
+        merged = True
+        while merged:
+            merged = False
+            for i, a in enumerate(groups):
+                for b in groups[i + 1:]:
+                    if a[0] is not None and a[0] == b[0] and b[1] <= a[2] + 1 and b[2] >= a[1] - 1:
+                        a[1], a[2] = min(a[1], b[1]), max(a[2], b[2])
+                        groups.remove(b)
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        texts = []
+        for doc, first, last, chunk in groups:
+            if doc is None:
+                texts.append(chunk)
+                continue
+            rows = db.execute(
+                "SELECT text FROM paragraphs WHERE doc = ? AND idx BETWEEN ? AND ? ORDER BY idx",
+                (doc, first, last)
+            ).fetchall()
+            texts.append("\n\n".join(text for (text,) in rows) if rows else chunk)
+        return texts, len(chunk_ids) - len(groups)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Thin client for rag_service.py
+Standard library only, so calling the service costs no model or database start-up
+"""
+
+import codecs
+import http.client
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+
+
+class RagServiceError(RuntimeError):
+    """The service answered with an error status"""
+
+
+class RagClient:
+    """
+    Talks to a running rag_service.py over persistent HTTP/1.1 connections
+    (one per thread), reconnecting once if the service closed an idle one.
+    """
+
+    def __init__(self, base_url, timeout=120):
+        url = urlsplit(base_url)
+        self.host = url.hostname or "127.0.0.1"
+        self.port = url.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, method, path, payload=None):
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+        if response.status >= 400:
+            raise RagServiceError(f"{method} {path}: {response.status} {data.decode('utf-8', 'replace')}")
+        if response.getheader("Content-Type", "").startswith("application/json"):
+            return json.loads(data)
+        return data.decode("utf-8")
+
+    def ask(self, question):
+        return self._request("POST", "/ask", {"question": question})["answer"]
+
+    def ask_batch(self, questions):
+        return self._request("POST", "/batch", {"questions": list(questions)})["answers"]
+
+    def ask_stream(self, question):
+        """Yield the answer text as the service streams it"""
+        conn = self._connection()
+        body = json.dumps({"question": question}).encode("utf-8")
+        try:
+            conn.request("POST", "/stream", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # The service closed an idle keep-alive connection: retry once on a fresh one
+            conn.close()
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            conn.request("POST", "/stream", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+
+        if response.status >= 400:
+            raise RagServiceError(f"POST /stream: {response.status} {response.read().decode('utf-8', 'replace')}")
+
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        complete = False
+        try:
+            while True:
+                data = response.read1(65536)
+                if not data:
+                    break
+                text = decoder.decode(data)
+                if text:
+                    yield text
+            complete = True
+        finally:
+            if not complete:
+                # Truncated stream, or the caller stopped reading: the rest of the
+                # response is still on this connection, so it can't be reused
+                conn.close()
+                if getattr(self._local, "conn", None) is conn:
+                    self._local.conn = None
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def metrics(self):
+        return self._request("GET", "/metrics")
+
+
+def run_remote(base_url, argv):
+    """Task 5's command line (test questions, --stream or --batch FILE) answered by the service"""
+    client = RagClient(base_url)
+    chunks = client.health()["chunks"]
+    print(f"🛰️ Using RAG service at {base_url} ({chunks} chunks)")
+
+    if "--stream" in argv:
+        for question in ["Can I bring my dog to the office?", "How many vacation days do I get?"]:
+            print("\n" + "=" * 50)
+            print(f"📝 {question}")
+            print("💬 ANSWER:")
+            for text in client.ask_stream(question):
+                print(text, end="", flush=True)
+            print("\n" + "=" * 50)
+        return 0
+
+    if "--batch" in argv:
+        with open(argv[argv.index("--batch") + 1], "r") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        answers = client.ask_batch(questions)
+    else:
+        questions = [
+            "Can I bring my dog to the office?",
+            "How many vacation days do I get?",
+            "What is the remote work policy?"
+        ]
+        answers = [client.ask(question) for question in questions]
+
+    for question, answer in zip(questions, answers):
+        print("\n" + "=" * 50)
+        print(f"📝 {question}")
+        print("💬 ANSWER:")
+        print(answer)
+        print("=" * 50)
+
+    if "--batch" not in argv and chunks:
+        # Same marker as Task 5's local test run
+        os.makedirs("/root/markers", exist_ok=True)
+        with open("/root/markers/task5_rag_complete.txt", "w") as f:
+            f.write("TASK5_COMPLETE:RAG_PIPELINE_READY")
+        print("\n✅ Task 5 completed!")
+    return 0
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Per-stage latency metrics for the RAG pipeline
+Timing spans, HDR-style histograms, token counts and JSONL / Prometheus-text export
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histograms record microseconds; 64 sub-buckets per power of two keep every
+# recorded value within ~1.6% (two significant digits), like HdrHistogram
+_SUB_BUCKETS = 64
+
+
+def _bucket_index(value):
+    if value < 2 * _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - 7
+    return 2 * _SUB_BUCKETS + (shift - 1) * _SUB_BUCKETS + (value >> shift) - _SUB_BUCKETS
+
+
+def _bucket_value(index):
+    """Midpoint of the values that map to a bucket"""
+    if index < 2 * _SUB_BUCKETS:
+        return index
+    shift = (index - 2 * _SUB_BUCKETS) // _SUB_BUCKETS + 1
+    sub = (index - 2 * _SUB_BUCKETS) % _SUB_BUCKETS + _SUB_BUCKETS
+    return (sub << shift) + (1 << shift) // 2
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations in seconds with percentile queries"""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        index = _bucket_index(max(0, int(seconds * 1e6)))
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Value (seconds) at or below which p percent of recordings fall"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, round(p / 100 * self.count))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    return min(_bucket_value(index) / 1e6, self.max)
+        return self.max
+
+
+class _NullTrace:
+    """Trace that records nothing (metrics disabled or no request in flight)"""
+
+    @contextmanager
+    def span(self, stage):
+        yield
+
+    def record_usage(self, response):
+        pass
+
+    def record_stream(self, first_token_at, tokens, finished_at):
+        pass
+
+    def note(self, key, value):
+        pass
+
+    def finish(self, outcome):
+        pass
+
+
+NO_TRACE = _NullTrace()
+
+
+class RequestTrace:
+    """Stage timings and token usage of one pipeline request"""
+
+    def __init__(self, metrics, question):
+        self.metrics = metrics
+        self.question = question
+        self.stages = {}
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.tokens_per_sec = None
+        self.notes = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - started
+
+    def record_usage(self, response):
+        """Add the token counts reported in an LLM response's metadata"""
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            self.input_tokens += usage.get("input_tokens", 0)
+            self.output_tokens += usage.get("output_tokens", 0)
+            return
+
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        self.input_tokens += token_usage.get("prompt_tokens", 0)
+        self.output_tokens += token_usage.get("completion_tokens", 0)
+
+    def record_stream(self, first_token_at, tokens, finished_at):
+        """
+        Streaming timings (perf_counter values): time-to-first-token since the
+        request started, recorded as the "ttft" stage, and generation speed
+        from the first token on.
+        """
+        self.stages["ttft"] = first_token_at - self._started
+        generating = finished_at - first_token_at
+        self.tokens_per_sec = tokens / generating if generating > 0 else None
+
+    def note(self, key, value):
+        """Attach a decision (e.g. the adaptive k and why) to the request's log line"""
+        self.notes[key] = value
+
+    def finish(self, outcome):
+        """outcome: how the request was answered (llm, cache, faq, fallback, batch)"""
+        self.stages["total"] = time.perf_counter() - self._started
+        self.metrics.record(self, outcome)
+
+
+class RagMetrics:
+    """
+    In-process aggregation of request traces: one LatencyHistogram per
+    stage plus token and outcome counters. Each finished request is also
+    appended to a JSONL log, and the aggregates can be written as a
+    Prometheus text file.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.histograms = {}
+        self.outcomes = {}
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.streamed = 0
+        self.tokens_per_sec_total = 0.0
+        self._lock = threading.Lock()
+
+        if prometheus_path:
+            atexit.register(self.write_prometheus)
+
+    def trace(self, question):
+        return RequestTrace(self, question)
+
+    def record(self, trace, outcome):
+        with self._lock:
+            for stage in trace.stages:
+                self.histograms.setdefault(stage, LatencyHistogram())
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.input_tokens += trace.input_tokens
+            self.output_tokens += trace.output_tokens
+            if trace.tokens_per_sec is not None:
+                self.streamed += 1
+                self.tokens_per_sec_total += trace.tokens_per_sec
+
+        for stage, seconds in trace.stages.items():
+            self.histograms[stage].record(seconds)
+
+        if self.jsonl_path:
+            event = {
+                "ts": time.time(),
+                "question": trace.question,
+                "outcome": outcome,
+                "stages_ms": {stage: round(seconds * 1000, 3) for stage, seconds in trace.stages.items()},
+                "input_tokens": trace.input_tokens,
+                "output_tokens": trace.output_tokens
+            }
+            if trace.tokens_per_sec is not None:
+                event["tokens_per_sec"] = round(trace.tokens_per_sec, 1)
+            event.update(trace.notes)
+            line = json.dumps(event) + "\n"
+            with self._lock, open(self.jsonl_path, "a") as f:
+                f.write(line)
+
+    def report(self):
+        """Per-stage p50/p95/p99 table (milliseconds) as a printable string"""
+        lines = [
+            f"{'stage':<12} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}",
+            "-" * 59
+        ]
+        with self._lock:
+            histograms = list(self.histograms.items())
+        # Pipeline stages in the order they first ran, total last
+        histograms.sort(key=lambda item: item[0] == "total")
+        for stage, h in histograms:
+            lines.append(
+                f"{stage:<12} {h.count:>6} {h.percentile(50) * 1000:>9.1f} {h.percentile(95) * 1000:>9.1f} "
+                f"{h.percentile(99) * 1000:>9.1f} {h.max * 1000:>9.1f}"
+            )
+        outcomes = ", ".join(f"{name}={count}" for name, count in sorted(self.outcomes.items()))
+        lines.append("-" * 59)
+        lines.append(f"requests: {outcomes or 'none'}")
+        lines.append(f"tokens: {self.input_tokens} input, {self.output_tokens} output")
+        if self.streamed:
+            lines.append(f"streaming: {self.tokens_per_sec_total / self.streamed:.1f} tokens/sec mean "
+                         f"over {self.streamed} streamed answers")
+        return "\n".join(lines)
+
+    def prometheus_text(self):
+        """The aggregates in Prometheus text exposition format"""
+        lines = [
+            "# HELP rag_stage_seconds RAG pipeline stage latency",
+            "# TYPE rag_stage_seconds summary"
+        ]
+        with self._lock:
+            histograms = list(self.histograms.items())
+        for stage, h in histograms:
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'rag_stage_seconds{{stage="{stage}",quantile="{q}"}} {h.percentile(q * 100):.6f}')
+            lines.append(f'rag_stage_seconds_sum{{stage="{stage}"}} {h.total:.6f}')
+            lines.append(f'rag_stage_seconds_count{{stage="{stage}"}} {h.count}')
+
+        lines += ["# HELP rag_requests_total Answered requests by outcome", "# TYPE rag_requests_total counter"]
+        lines += [f'rag_requests_total{{outcome="{o}"}} {n}' for o, n in sorted(self.outcomes.items())]
+        lines += ["# HELP rag_llm_tokens_total LLM tokens from response metadata", "# TYPE rag_llm_tokens_total counter"]
+        lines.append(f'rag_llm_tokens_total{{kind="input"}} {self.input_tokens}')
+        lines.append(f'rag_llm_tokens_total{{kind="output"}} {self.output_tokens}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Write prometheus_text() atomically to path (default: prometheus_path)"""
+        path = path or self.prometheus_path
+        if not path:
+            return
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Resident RAG service
+Loads the encoder, collection and LLM client once and answers over HTTP/1.1 keep-alive
+
+Usage: python3 rag_service.py
+       RAG_SERVICE_URL=http://127.0.0.1:8765 python3 task_5_complete_rag.py
+
+Endpoints:
+  POST /ask      {"question": "..."}          -> {"answer": "..."}
+  POST /batch    {"questions": ["...", ...]}  -> {"answers": [...]}
+  POST /stream   {"question": "..."}          -> answer text, chunked as it is generated
+  GET  /health                                -> {"status": "ok", "chunks": N}
+  GET  /metrics                               -> Prometheus text (see rag_metrics.py)
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Importing Task 5 builds every component once for the lifetime of the process
+from task_5_complete_rag import (
+    collection, faq_index, metrics, model, rag_pipeline, rag_pipeline_batch, rag_pipeline_stream
+)
+
+HOST = os.getenv("RAG_SERVICE_HOST", "127.0.0.1")
+PORT = int(os.getenv("RAG_SERVICE_PORT", "8765"))
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = float(os.getenv("RAG_SERVICE_KEEPALIVE_SECONDS", "60"))
+# FAQ entries whose chunks were re-ingested are regenerated this often (0 disables)
+FAQ_REFRESH_SECONDS = float(os.getenv("RAG_FAQ_REFRESH_SECONDS", "300"))
+
+
+def warm_up():
+    """Run the encoder and the vector index once so the first request is not a cold one"""
+    started = time.perf_counter()
+    embedding = model.encode("warm-up").tolist()
+    if collection.count():
+        collection.query(query_embeddings=[embedding], n_results=1)
+    print(f"🔥 Warmed up encoder and index in {time.perf_counter() - started:.2f}s")
+
+
+def refresh_faq_forever():
+    """Background loop: rebuild stale FAQ entries so re-ingested documents are reflected"""
+    from build_faq_index import refresh_stale
+
+    while True:
+        time.sleep(FAQ_REFRESH_SECONDS)
+        try:
+            refresh_stale(faq_index)
+        except Exception as e:
+            print(f"⚠️ FAQ refresh failed: {e}")
+
+
+class RagRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests (every response sets Content-Length)
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, pieces):
+        """Chunked transfer encoding: each text piece is written as soon as it exists"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for text in pieces:
+                data = text.encode("utf-8")
+                if data:
+                    self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+        except Exception as e:
+            # Headers are already out: drop the connection so the client sees a truncated body
+            self.log_error("stream aborted: %s", e)
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok", "chunks": collection.count()})
+        elif self.path == "/metrics":
+            self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send(400, {"error": "request body must be JSON"})
+            return
+
+        try:
+            if self.path == "/ask" and isinstance(payload.get("question"), str):
+                self._send(200, {"answer": rag_pipeline(payload["question"])})
+            elif self.path == "/batch" and isinstance(payload.get("questions"), list):
+                self._send(200, {"answers": rag_pipeline_batch(payload["questions"])})
+            elif self.path == "/stream" and isinstance(payload.get("question"), str):
+                self._send_stream(rag_pipeline_stream(payload["question"]))
+            elif self.path in ("/ask", "/batch", "/stream"):
+                self._send(400, {"error": "expected {\"question\": str} or {\"questions\": [str]}"})
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+        except Exception as e:
+            self._send(500, {"error": str(e)})
+
+
+def main():
+    warm_up()
+    if faq_index is not None and FAQ_REFRESH_SECONDS > 0:
+        threading.Thread(target=refresh_faq_forever, name="faq-refresh", daemon=True).start()
+        print(f"📚 Serving {len(faq_index)} precomputed FAQ answers "
+              f"(stale entries rebuilt every {FAQ_REFRESH_SECONDS:.0f}s)")
+    server = ThreadingHTTPServer((HOST, PORT), RagRequestHandler)
+    server.daemon_threads = True
+    print(f"🛰️ RAG service listening on http://{HOST}:{PORT} ({collection.count()} chunks)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 RAG service stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
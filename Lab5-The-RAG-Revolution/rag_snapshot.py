@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Snapshot export/import for the techcorp_rag collection
+Packs vectors, ids, documents, metadata, the ingestion manifest and the parent store into one
+versioned, checksummed file so a new replica restores without re-embedding anything
+
+Usage: python3 rag_snapshot.py export techcorp_rag.snap [--dir DIR]
+       python3 rag_snapshot.py import techcorp_rag.snap [--dir DIR] [--replace] [--no-verify]
+       python3 rag_snapshot.py info techcorp_rag.snap
+
+DIR (default: the current directory) holds chroma_db/ and the files Task 2 writes next to it.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import sys
+import time
+
+import numpy as np
+
+from bm25_index import build_index, BM25_INDEX_PATH
+from section_router import compute_centroids, save_centroids, CENTROIDS_PATH
+from ingest_manifest import MANIFEST_PATH
+from parent_store import PARENT_STORE_PATH
+
+# File layout:
+#   magic, u32 format version, zero padding up to DATA_OFFSET
+#   vectors   count x dim little-endian float32 rows, page-aligned so np.memmap maps them in place
+#   records   one JSON line [id, document, metadata] per vector row
+#   manifest  ingest_manifest.json as exported (may be empty)
+#   parent_store  a consistent copy of parent_store.sqlite (may be empty; absent before it was added)
+#   header    JSON: collection, count, dim and offset/length/sha256 of every section
+#   footer    u64 header offset, u64 header length, header sha256, magic
+SNAPSHOT_MAGIC = b"RAGSNAP\0"
+SNAPSHOT_VERSION = 1
+DATA_OFFSET = 4096
+_PREAMBLE = struct.Struct("<8sI")
+_FOOTER = struct.Struct("<QQ32s8s")
+
+
+class SnapshotError(ValueError):
+    """Not a snapshot, an unsupported version, or a corrupted one"""
+
+
+class _SectionWriter:
+    """Appends one section to the open snapshot file, hashing it on the way"""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+        self.length = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.f.write(data)
+        self.sha256.update(data)
+        self.length += len(data)
+
+    def describe(self):
+        return {"offset": self.offset, "length": self.length, "sha256": self.sha256.hexdigest()}
+
+
+def export_snapshot(collection, path, manifest_path=MANIFEST_PATH, page_size=5000,
+                    parent_store_path=PARENT_STORE_PATH):
+    """
+    Write every chunk of `collection` to a snapshot file at `path`
+    (atomically). Vectors and records are written page by page, so
+    memory use does not grow with the collection. Returns the header.
+    """
+    count = collection.count()
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION).ljust(DATA_OFFSET, b"\0"))
+
+        # Vectors first (fixed-size rows); the text records are buffered to a side file
+        vectors = _SectionWriter(f)
+        records_path = f"{path}.records.tmp"
+        dim, written = 0, 0
+        with open(records_path, "wb") as records_file:
+            offset = 0
+            while True:
+                page = collection.get(
+                    include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset
+                )
+                if not len(page["ids"]):
+                    break
+                rows = np.asarray(page["embeddings"], dtype="<f4")
+                dim = dim or rows.shape[1]
+                if rows.shape[1] != dim:
+                    raise SnapshotError(f"mixed embedding sizes: {rows.shape[1]} after {dim}")
+                vectors.write(rows.tobytes())
+                for record in zip(page["ids"], page["documents"], page["metadatas"]):
+                    records_file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                written += len(page["ids"])
+                offset += len(page["ids"])
+
+        records = _SectionWriter(f)
+        with open(records_path, "rb") as records_file:
+            for block in iter(lambda: records_file.read(1 << 20), b""):
+                records.write(block)
+        os.remove(records_path)
+
+        manifest = _SectionWriter(f)
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, "rb") as manifest_file:
+                manifest.write(manifest_file.read())
+
+        parents = _SectionWriter(f)
+        if parent_store_path and os.path.exists(parent_store_path):
+            # sqlite's backup API copies a consistent state even while Task 2 writes to the store
+            copy_path = f"{path}.parents.tmp"
+            source, copy = sqlite3.connect(parent_store_path), sqlite3.connect(copy_path)
+            source.backup(copy)
+            source.close()
+            copy.close()
+            with open(copy_path, "rb") as copy_file:
+                for block in iter(lambda: copy_file.read(1 << 20), b""):
+                    parents.write(block)
+            os.remove(copy_path)
+
+        if written != count:
+            raise SnapshotError(f"collection changed during export ({count} chunks, {written} read)")
+
+        header = {
+            "format": SNAPSHOT_VERSION,
+            "collection": collection.name,
+            "metadata": collection.metadata,
+            "count": written,
+            "dim": dim,
+            "dtype": "<f4",
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "sections": {
+                "vectors": vectors.describe(),
+                "records": records.describe(),
+                "manifest": manifest.describe(),
+                "parent_store": parents.describe()
+            }
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        header_offset = f.tell()
+        f.write(header_bytes)
+        f.write(_FOOTER.pack(
+            header_offset, len(header_bytes), hashlib.sha256(header_bytes).digest(), SNAPSHOT_MAGIC
+        ))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return header
+
+
+class Snapshot:
+    """
+    Read side of a snapshot file. The header is checked on open; section
+    checksums by verify(). `vectors` is a read-only np.memmap, so opening
+    a snapshot reads no vector data until rows are used.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"{path} is not a RAG snapshot")
+            if version != SNAPSHOT_VERSION:
+                raise SnapshotError(f"{path} is snapshot format {version}, this tool reads {SNAPSHOT_VERSION}")
+
+            f.seek(-_FOOTER.size, os.SEEK_END)
+            header_offset, header_length, header_sha256, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise SnapshotError(f"{path} is truncated")
+            f.seek(header_offset)
+            header_bytes = f.read(header_length)
+            if hashlib.sha256(header_bytes).digest() != header_sha256:
+                raise SnapshotError(f"{path}: header checksum mismatch")
+        self.header = json.loads(header_bytes)
+
+    @property
+    def count(self):
+        return self.header["count"]
+
+    @property
+    def vectors(self):
+        section = self.header["sections"]["vectors"]
+        if not self.count:
+            return np.empty((0, self.header["dim"]), dtype=self.header["dtype"])
+        return np.memmap(
+            self.path, dtype=self.header["dtype"], mode="r", offset=section["offset"],
+            shape=(self.count, self.header["dim"])
+        )
+
+    def iter_records(self):
+        """(id, document, metadata) per vector row, in row order"""
+        section = self.header["sections"]["records"]
+        with open(self.path, "rb") as f:
+            f.seek(section["offset"])
+            remaining = section["length"]
+            while remaining > 0:
+                line = f.readline(remaining)
+                remaining -= len(line)
+                yield tuple(json.loads(line))
+
+    def manifest_bytes(self):
+        section = self.header["sections"]["manifest"]
+        with open(self.path, "rb") as f:
+            f.seek(section["offset"])
+            return f.read(section["length"])
+
+    def write_section(self, name, out_path):
+        """
+        Copy a section to out_path (atomically). Returns False, writing
+        nothing, when the section is empty or the snapshot predates it.
+        """
+        section = self.header["sections"].get(name)
+        if not section or not section["length"]:
+            return False
+        tmp_path = f"{out_path}.tmp"
+        with open(self.path, "rb") as f, open(tmp_path, "wb") as out:
+            f.seek(section["offset"])
+            remaining = section["length"]
+            while remaining > 0:
+                block = f.read(min(remaining, 1 << 20))
+                out.write(block)
+                remaining -= len(block)
+        os.replace(tmp_path, out_path)
+        return True
+
+    def verify(self):
+        """Check every section against its sha256; raises SnapshotError on a mismatch"""
+        with open(self.path, "rb") as f:
+            for name, section in self.header["sections"].items():
+                f.seek(section["offset"])
+                digest = hashlib.sha256()
+                remaining = section["length"]
+                while remaining > 0:
+                    block = f.read(min(remaining, 1 << 20))
+                    if not block:
+                        break
+                    digest.update(block)
+                    remaining -= len(block)
+                if remaining or digest.hexdigest() != section["sha256"]:
+                    raise SnapshotError(f"{self.path}: {name} section checksum mismatch")
+
+
+def import_snapshot(snapshot, client, replace=False, batch_size=5000, manifest_path=MANIFEST_PATH,
+                    parent_store_path=PARENT_STORE_PATH):
+    """
+    Restore a Snapshot into a chromadb client: ids, documents, metadata and
+    the stored vectors are added in batches straight from the memory-mapped
+    section (no encoder involved), then the manifest and parent store are
+    written. Refuses to overwrite a non-empty collection unless replace is
+    set. Returns the restored collection.
+    """
+    name = snapshot.header["collection"]
+    existing = client.get_or_create_collection(name)
+    if existing.count() and not replace:
+        raise SnapshotError(f"collection {name} already has {existing.count()} chunks (use --replace)")
+    # Recreated so it gets the exported collection metadata (hnsw:space)
+    client.delete_collection(name)
+    collection = client.create_collection(name, metadata=snapshot.header["metadata"] or None)
+
+    vectors = snapshot.vectors
+    batch, start = [], 0
+    for record in snapshot.iter_records():
+        batch.append(record)
+        if len(batch) == batch_size:
+            _add_batch(collection, batch, vectors[start:start + len(batch)])
+            start += len(batch)
+            batch = []
+    if batch:
+        _add_batch(collection, batch, vectors[start:start + len(batch)])
+
+    manifest = snapshot.manifest_bytes()
+    if manifest and manifest_path:
+        tmp_path = f"{manifest_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(manifest)
+        os.replace(tmp_path, manifest_path)
+
+    if parent_store_path and not snapshot.write_section("parent_store", parent_store_path):
+        # None exported: a store left here would describe other chunks; Task 2 backfills a new one
+        for stale_path in (parent_store_path, f"{parent_store_path}-wal", f"{parent_store_path}-shm"):
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+    return collection
+
+
+def _add_batch(collection, records, rows):
+    ids, documents, metadatas = zip(*records)
+    collection.add(
+        ids=list(ids),
+        embeddings=np.array(rows, dtype=np.float32),
+        documents=list(documents),
+        metadatas=list(metadatas)
+    )
+
+
+def rebuild_derived_indexes(snapshot, bm25_path=BM25_INDEX_PATH, centroids_path=CENTROIDS_PATH, page_size=5000):
+    """BM25 index and section centroids for the restored chunks, computed from the snapshot itself"""
+    build_index(((cid, document) for cid, document, _ in snapshot.iter_records()), bm25_path)
+
+    def pages():
+        vectors, records = snapshot.vectors, snapshot.iter_records()
+        for start in range(0, snapshot.count, page_size):
+            rows = vectors[start:start + page_size]
+            yield {"embeddings": rows, "metadatas": [next(records)[2] for _ in range(len(rows))]}
+
+    save_centroids(compute_centroids(pages()), centroids_path)
+
+
+def _print_header(path, header):
+    sections = header["sections"]
+    print(f"📦 {path}: format {header['format']}, collection {header['collection']} "
+          f"({header['count']} chunks × {header['dim']} dims), created {header['created']}")
+    for name, section in sections.items():
+        print(f"   {name:12s} {section['length'] / 1e6:9.2f} MB  sha256 {section['sha256'][:16]}…")
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ("export", "import", "info"):
+        print(__doc__)
+        return 1
+
+    command, path = argv[0], os.path.abspath(argv[1])
+    # Resolve everything under --dir instead of wherever this is run from
+    base_dir = os.path.abspath(argv[argv.index("--dir") + 1]) if "--dir" in argv else os.getcwd()
+
+    if command == "info":
+        snapshot = Snapshot(path)
+        _print_header(path, snapshot.header)
+        snapshot.verify()
+        print("✅ All section checksums match")
+        return 0
+
+    import chromadb
+    client = chromadb.PersistentClient(path=os.path.join(base_dir, "chroma_db"))
+    started = time.perf_counter()
+
+    if command == "export":
+        header = export_snapshot(
+            client.get_or_create_collection("techcorp_rag"), path, os.path.join(base_dir, MANIFEST_PATH),
+            parent_store_path=os.path.join(base_dir, PARENT_STORE_PATH)
+        )
+        _print_header(path, header)
+        print(f"✅ Exported in {time.perf_counter() - started:.2f}s")
+        return 0
+
+    os.makedirs(base_dir, exist_ok=True)
+    snapshot = Snapshot(path)
+    _print_header(path, snapshot.header)
+    if "--no-verify" not in argv:
+        snapshot.verify()
+        print(f"   🔒 Checksums verified ({time.perf_counter() - started:.2f}s)")
+    collection = import_snapshot(
+        snapshot, client, replace="--replace" in argv, manifest_path=os.path.join(base_dir, MANIFEST_PATH),
+        parent_store_path=os.path.join(base_dir, PARENT_STORE_PATH)
+    )
+    print(f"   📥 Restored {collection.count()} chunks into {os.path.join(base_dir, 'chroma_db')} "
+          f"({time.perf_counter() - started:.2f}s)")
+    rebuild_derived_indexes(
+        snapshot, os.path.join(base_dir, BM25_INDEX_PATH), os.path.join(base_dir, CENTROIDS_PATH)
+    )
+    print(f"✅ Restored and indexed in {time.perf_counter() - started:.2f}s - "
+          f"run Task 5 from {base_dir} to serve it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
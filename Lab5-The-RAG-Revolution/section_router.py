@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Section routing for retrieval
+Per-section centroid vectors let Task 5 search only the sections a question is about
+"""
+
+import json
+import os
+
+import numpy as np
+
+# Written by Task 2 next to ./chroma_db
+CENTROIDS_PATH = "./section_centroids.json"
+
+
+def add_to_section_sums(sums, embeddings, metadatas, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) vectors from per-section running sums,
+    {section: {"sum": [...], "count": n}}, in place. Sections that lose
+    their last vector are dropped.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float64)
+    sections = [metadata["section"] for metadata in metadatas]
+    for section in sorted(set(sections)):
+        rows = [i for i, name in enumerate(sections) if name == section]
+        entry = sums.setdefault(section, {"sum": np.zeros(embeddings.shape[1]).tolist(), "count": 0})
+        entry["sum"] = (np.asarray(entry["sum"]) + sign * embeddings[rows].sum(axis=0)).tolist()
+        entry["count"] += sign * len(rows)
+        if entry["count"] <= 0:
+            del sums[section]
+    return sums
+
+
+def section_sums(pages):
+    """Per-section running sums of collection pages (dicts with 'embeddings' and 'metadatas')"""
+    sums = {}
+    for page in pages:
+        add_to_section_sums(sums, page["embeddings"], page["metadatas"])
+    return sums
+
+
+def centroids_from_sums(sums):
+    """Mean embedding per section from add_to_section_sums() running sums"""
+    return {
+        section: {
+            "count": sums[section]["count"],
+            "centroid": (np.asarray(sums[section]["sum"]) / sums[section]["count"]).tolist()
+        }
+        for section in sorted(sums)
+    }
+
+
+def compute_centroids(pages):
+    """
+    Mean embedding per section from collection pages (dicts with
+    'embeddings' and 'metadatas', as collection.get returns them).
+    """
+    return centroids_from_sums(section_sums(pages))
+
+
+def save_centroids(centroids, path=CENTROIDS_PATH):
+    """Write the centroids atomically so Task 5 never reads a partial file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"sections": centroids}, f)
+    os.replace(tmp_path, path)
+
+
+def section_filter(sections):
+    """Chroma `where` filter restricting a search to the given sections"""
+    if len(sections) == 1:
+        return {"section": sections[0]}
+    return {"section": {"$in": list(sections)}}
+
+
+class SectionRouter:
+    """
+    Picks the top_m sections whose centroid is most similar (cosine) to a
+    query embedding. Returns None, meaning search everything, when there
+    are no more than top_m sections to choose from.
+    """
+
+    def __init__(self, path=CENTROIDS_PATH, top_m=2):
+        self.path = path
+        self.top_m = top_m
+        self._mtime = None
+        self._state = ([], np.empty((0, 0), dtype=np.float32))
+        self.reload_if_changed()
+
+    @staticmethod
+    def exists(path=CENTROIDS_PATH):
+        return os.path.exists(path)
+
+    def reload_if_changed(self):
+        """Pick up centroids Task 2 rewrote since they were loaded"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+
+        with open(self.path, "r") as f:
+            sections = json.load(f)["sections"]
+        names = list(sections)
+        matrix = np.asarray([sections[name]["centroid"] for name in names], dtype=np.float32)
+        if len(names):
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        self._state = (names, matrix)
+        self._mtime = mtime
+
+    @property
+    def sections(self):
+        return list(self._state[0])
+
+    def route(self, query_embedding):
+        """Best top_m section names for a query, best first (None = no routing)"""
+        names, matrix = self._state
+        if len(names) <= self.top_m:
+            return None
+
+        similarities = matrix @ np.asarray(query_embedding, dtype=np.float32)
+        best = np.argsort(-similarities)[:self.top_m]
+        return [names[i] for i in best]
+
+    def where(self, query_embedding):
+        """Chroma `where` filter for a query, or None to search every section"""
+        sections = self.route(query_embedding)
+        return section_filter(sections) if sections else None
@@ -4,10 +4,26 @@ Task 2: Smart Document Processing
 Implement paragraph-based chunking for better RAG context
 """
 
+import copy
 import os
+import shutil
+import sys
+import time
 import chromadb
-from sentence_transformers import SentenceTransformer
 from pathlib import Path
+from ingest_manifest import load_manifest, save_manifest, entry_chunk_ids, file_key
+from ingest_pipeline import start_producer, RECORD, PARAGRAPH, FILE_DONE, DONE
+from embedding_cache import CachedEncoder
+from paragraph_embeddings import compose_chunk_embeddings
+from embedding_pool import EmbeddingPool
+from onnx_encoder import load_encoder, encoder_cache_name
+from chunking import sample_chunks, iter_paragraphs
+from chunk_dedup import NearDuplicateIndex
+from doc_watcher import watch_documents, watch_backend
+from bm25_index import build_index, update_index, Bm25Index, BM25_INDEX_PATH
+from section_router import add_to_section_sums, section_sums, centroids_from_sums, save_centroids, CENTROIDS_PATH
+from parent_store import ParentStore, PARENT_STORE_PATH
+from faq_index import FaqIndex
 
 print("📄 Task 2: Smart Document Processing")
 print("=" * 50)
@@ -15,10 +31,41 @@ print("=" * 50)
 # Initialize components from Task 1
 client = chromadb.PersistentClient(path="./chroma_db")
 collection = client.get_or_create_collection("techcorp_rag")
-model = SentenceTransformer("all-MiniLM-L6-v2")
+doc_dir = Path("/root/techcorp-docs")
+
+# EMBED_WORKERS=N shards encoding across N processes with pinned torch threads
+# (EMBED_THREADS each); "auto" calibrates workers x threads x batch size on a
+# sample of the corpus. The pool is created before any encoding happens.
+EMBED_WORKERS = os.getenv("EMBED_WORKERS", "1")
+if not (EMBED_WORKERS == "auto" or EMBED_WORKERS.isdigit()):
+    print(f"⚠️ Ignoring EMBED_WORKERS={EMBED_WORKERS!r} (expected a number or \"auto\")")
+    EMBED_WORKERS = "1"
+EMBED_THREADS = os.getenv("EMBED_THREADS", "0")
+if not EMBED_THREADS.isdigit():
+    print(f"⚠️ Ignoring EMBED_THREADS={EMBED_THREADS!r} (expected a number)")
+    EMBED_THREADS = "0"
+embedding_pool = None
+if EMBED_WORKERS == "auto":
+    print("⚙️ Calibrating embedding pool...")
+    model = embedding_pool = EmbeddingPool.autotune("all-MiniLM-L6-v2", sample_chunks(doc_dir))
+elif int(EMBED_WORKERS) > 1:
+    model = embedding_pool = EmbeddingPool(
+        "all-MiniLM-L6-v2", workers=int(EMBED_WORKERS), threads_per_worker=int(EMBED_THREADS) or None
+    )
+else:
+    # EMBEDDING_BACKEND=onnx-int8 selects the quantized ONNX encoder
+    model = load_encoder("all-MiniLM-L6-v2")
+
+# Serve previously embedded chunk texts from the shared on-disk cache
+# (EMBEDDING_CACHE=0 disables it)
+if os.getenv("EMBEDDING_CACHE", "1") == "1":
+    model = CachedEncoder(model, encoder_cache_name("all-MiniLM-L6-v2"))
 
 print("✅ Loaded vector store and embedding model")
 
+# The chunking exercise: start_producer() hands both functions to the chunking
+# workers, so every document below INGEST_STREAM_THRESHOLD_MB is chunked and
+# labelled by them (bigger files are streamed through chunking.py's equivalent)
 def smart_chunk_document(text, overlap_ratio=0.2):
     """
     Smart paragraph-based chunking with overlap
@@ -50,57 +97,462 @@ def smart_chunk_document(text, overlap_ratio=0.2):
 
     return chunks
 
+def document_metadata(doc_file, category_dir):
+    """Metadata for document tracking"""
+    # TODO 3: Create metadata for document tracking
+    # Hint: Use doc_file.name for source, category_dir.name for section
+    return {
+        "source": doc_file.name,  # Replace ___ with doc_file.name
+        "section": category_dir.name  # Replace ___ with category_dir.name
+    }
+
+# Chunks are collected across files and embedded/written in batches:
+# one model.encode and one collection.upsert per batch instead of per chunk
+BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+ENCODE_BATCH_SIZE = int(os.getenv("INGEST_ENCODE_BATCH_SIZE", str(getattr(model, "batch_size", 64))))
+# Set INGEST_FULL_REBUILD=1 to drop techcorp_rag and the stores derived from it
+# and re-embed everything
+FULL_REBUILD = os.getenv("INGEST_FULL_REBUILD", "0") == "1"
+# Reading and chunking runs in a process pool that overlaps with embedding
+# (INGEST_WORKERS=0 chunks in a single background thread instead)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", str(BATCH_SIZE * 4)))
+# Files this large are streamed paragraph by paragraph instead of read whole
+STREAM_THRESHOLD_MB = int(os.getenv("INGEST_STREAM_THRESHOLD_MB", "32"))
+# "chunk" encodes every chunk's text; "paragraph" encodes each paragraph once
+# and composes chunk vectors from them (see benchmark_chunk_embeddings.py)
+CHUNK_EMBEDDING_MODE = os.getenv("CHUNK_EMBEDDING_MODE", "chunk")
+PARAGRAPH_MODE = CHUNK_EMBEDDING_MODE == "paragraph"
+# Near-duplicate chunks of one section (MinHash/LSH, estimated Jaccard >= INGEST_DEDUP_THRESHOLD)
+# are stored once with merged sources; INGEST_DEDUP=0 stores every chunk
+DEDUP = os.getenv("INGEST_DEDUP", "1") == "1"
+DEDUP_THRESHOLD = float(os.getenv("INGEST_DEDUP_THRESHOLD", "0.85"))
+# BM25 inverted index over the stored chunks for Task 5's hybrid retrieval,
+# updated with each sync's upserts and deletes (BM25_INDEX=0 skips it)
+BM25 = os.getenv("BM25_INDEX", "1") == "1"
+# Mean embedding per section, which Task 5 uses to route queries to the
+# relevant sections; running sums live in the manifest (SECTION_CENTROIDS=0 skips it)
+SECTION_CENTROIDS = os.getenv("SECTION_CENTROIDS", "1") == "1"
+# Paragraphs of every file stored once in a sqlite side store, with each chunk's
+# paragraph span, so Task 5 can merge adjacent hits (PARENT_STORE=0 skips it)
+parent_store = ParentStore(PARENT_STORE_PATH) if os.getenv("PARENT_STORE", "1") == "1" else None
+
+pending_ids = []
+pending_chunks = []
+pending_metadatas = []
+pending_parts = []
+paragraphs_encoded = 0
+# Chunk texts written and chunk ids deleted since the last BM25 update, for update_index
+bm25_upserts = {}
+bm25_deleted = set()
+
+def forget_vectors(manifest, ids):
+    """Take the stored vectors of these chunk ids (those that exist) out of the section sums"""
+    if SECTION_CENTROIDS and ids:
+        stored = collection.get(ids=list(ids), include=["embeddings", "metadatas"])
+        if len(stored["ids"]):
+            add_to_section_sums(manifest["sections"], stored["embeddings"], stored["metadatas"], sign=-1)
+
+def delete_chunks(manifest, ids):
+    """Delete chunks from techcorp_rag and from the derived indexes' bookkeeping"""
+    if not ids:
+        return
+    forget_vectors(manifest, ids)
+    collection.delete(ids=list(ids))
+    bm25_deleted.update(ids)
+    for cid in ids:
+        bm25_upserts.pop(cid, None)
+
+def flush_batch(manifest):
+    """Embed and store all pending chunks with one encode and one upsert"""
+    global paragraphs_encoded
+    if not pending_ids:
+        return 0
+
+    if PARAGRAPH_MODE:
+        embeddings, encoded = compose_chunk_embeddings(model, pending_parts, ENCODE_BATCH_SIZE)
+        embeddings = embeddings.tolist()
+        paragraphs_encoded += encoded
+    else:
+        embeddings = model.encode(
+            pending_chunks,
+            batch_size=ENCODE_BATCH_SIZE,
+            convert_to_numpy=True
+        ).tolist()
+
+    # upsert keeps re-runs idempotent since chunk ids are deterministic
+    forget_vectors(manifest, pending_ids)
+    collection.upsert(
+        ids=pending_ids,
+        embeddings=embeddings,
+        documents=pending_chunks,
+        metadatas=pending_metadatas
+    )
+    if SECTION_CENTROIDS:
+        add_to_section_sums(manifest["sections"], embeddings, pending_metadatas)
+    bm25_upserts.update(zip(pending_ids, pending_chunks))
+    bm25_deleted.difference_update(pending_ids)
+
+    flushed = len(pending_ids)
+    pending_ids.clear()
+    pending_chunks.clear()
+    pending_metadatas.clear()
+    pending_parts.clear()
+    return flushed
+
+def iter_stored_pages(include, page_size=5000):
+    """Every chunk in techcorp_rag, as collection.get pages"""
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += len(page["ids"])
+
+def iter_stored_chunks(page_size=5000):
+    """(id, text) of every chunk in techcorp_rag, read page by page"""
+    for page in iter_stored_pages(["documents"], page_size):
+        yield from zip(page["ids"], page["documents"])
+
+def rebuild_bm25_index():
+    """Rebuild ./bm25_index from what techcorp_rag now stores (after dedup and deletes)"""
+    started = time.perf_counter()
+    documents, terms = build_index(iter_stored_chunks(), BM25_INDEX_PATH)
+    print(f"   🔤 BM25 index: {documents} chunks, {terms} terms ({time.perf_counter() - started:.2f}s)")
+
+def update_bm25_index():
+    """Apply this sync's upserts and deletes to ./bm25_index, or rebuild it once the delta grows too big"""
+    started = time.perf_counter()
+    if not update_index(bm25_upserts, bm25_deleted, BM25_INDEX_PATH):
+        rebuild_bm25_index()
+        return
+    print(f"   🔤 BM25 index: {len(bm25_upserts)} chunks written, {len(bm25_deleted)} deleted "
+          f"({time.perf_counter() - started:.2f}s)")
+
+def write_section_centroids(manifest):
+    """Write ./section_centroids.json from the manifest's per-section sums"""
+    centroids = centroids_from_sums(manifest["sections"])
+    save_centroids(centroids, CENTROIDS_PATH)
+    print("   🧭 Section centroids: " + ", ".join(f"{name} ({c['count']})" for name, c in centroids.items()))
+
+def backfill_parents(key, entry):
+    """Write an unchanged document's paragraphs and chunk spans to a parent store that lacks them"""
+    parent_store.replace_document(key, iter_paragraphs(doc_dir / key), entry_chunk_ids(entry))
+
+def sync_pass(manifest, only_keys, stats, file_outcomes, dedup):
+    """
+    One producer/consumer pass of sync_documents over only_keys (None = every
+    file). Near-duplicate chunks are recorded in manifest["duplicates"]; the
+    keys of files holding duplicates whose representative was rewritten or
+    deleted in this pass are returned so they can be re-embedded.
+    """
+    dedup_index, rep_metadatas, merged_sources = dedup["index"], dedup["metadatas"], dedup["sources"]
+    duplicates = manifest.setdefault("duplicates", {})  # duplicate chunk id -> {"rep", "file", "index"}
+    duplicate_ids = []
+    recorded = set()  # duplicates found in this pass
+    released = set()  # chunk ids rewritten or deleted in this pass
+    parent_key = None  # file whose paragraphs are being written to the parent store
+
+    record_queue, found_files, stop_producer = start_producer(
+        doc_dir, manifest, INGEST_WORKERS, QUEUE_SIZE,
+        with_parts=PARAGRAPH_MODE, stream_bytes=STREAM_THRESHOLD_MB << 20, only_keys=only_keys,
+        with_paragraphs=parent_store is not None, chunker=smart_chunk_document, make_metadata=document_metadata
+    )
+    seen_files = set(found_files)
+
+    # Embedding/writer stage: drain records while the workers keep chunking
+    drained = False
+    try:
+        while True:
+            kind, payload = record_queue.get()
+
+            if kind == RECORD:
+                record_id, chunk, metadata, parts = payload
+                duplicates.pop(record_id, None)  # re-emitted: its text changed
+
+                if DEDUP:
+                    # Matched within the chunk's own section only, so section filters still find it
+                    section_index = dedup_index.setdefault(
+                        metadata["section"], NearDuplicateIndex(threshold=DEDUP_THRESHOLD)
+                    )
+                    rep_id, signature = section_index.find(chunk)
+                    if rep_id is not None:
+                        merged_sources[rep_id].add(metadata["source"])
+                        duplicate_ids.append(record_id)
+                        duplicates[record_id] = {
+                            "rep": rep_id,
+                            "file": file_key(metadata["section"], metadata["source"]),
+                            "index": int(record_id.rsplit("_", 1)[1])
+                        }
+                        recorded.add(record_id)
+                        stats["saved_bytes"] += len(chunk.encode("utf-8"))
+                        continue
+                    if signature is not None:
+                        section_index.add(record_id, signature)
+                        rep_metadatas[record_id] = metadata
+                        merged_sources[record_id] = {metadata["source"]}
+
+                released.add(record_id)
+                pending_ids.append(record_id)
+                pending_chunks.append(chunk)
+                pending_metadatas.append(metadata)
+                pending_parts.append(parts)
+
+                if len(pending_ids) >= BATCH_SIZE:
+                    stats["embedded_chunks"] += flush_batch(manifest)
+
+            elif kind == PARAGRAPH:
+                # The paragraphs the file's chunks were cut from, streamed into the parent store
+                key, paragraph = payload
+                if key != parent_key:
+                    parent_store.start_document(key)
+                    parent_key = key
+                parent_store.add_paragraphs(key, (paragraph,))
+
+            elif kind == FILE_DONE:
+                key, result = payload
+
+                # Unchanged files are skipped without reading or chunking
+                if result is None:
+                    file_outcomes.setdefault(key, (False, len(manifest["files"][key]["chunks"])))
+                    if parent_store is not None and not parent_store.has_document(key):
+                        backfill_parents(key, manifest["files"][key])  # stores from older runs
+                    continue
+
+                # The file got shorter: drop chunk ids that no longer exist
+                if result["stale_ids"]:
+                    delete_chunks(manifest, result["stale_ids"])
+                    released.update(result["stale_ids"])
+                    for cid in result["stale_ids"]:
+                        duplicates.pop(cid, None)
+
+                manifest["files"][key] = result["entry"]
+                if parent_store is not None:
+                    parent_store.finish_document(key, entry_chunk_ids(result["entry"]))
+                    parent_key = None
+                file_outcomes[key] = (True, len(result["entry"]["chunks"]))
+                print(f"   ✅ {key}: {len(result['entry']['chunks'])} chunks ({result['changed']} re-embedded)")
+
+            elif kind == DONE:
+                if payload is not None:
+                    raise payload
+                drained = True
+                break
+    finally:
+        if not drained:
+            # A failed write (or producer error): stop the chunking workers blocked on
+            # the queue and roll back a half-written parent store document
+            stop_producer()
+            if parent_store is not None:
+                parent_store.discard()
+
+    stats["embedded_chunks"] += flush_batch(manifest)
+
+    # Collapse near-duplicates: drop their own vectors (left over from earlier
+    # runs) and list their sources on the representative chunk
+    if duplicate_ids:
+        delete_chunks(manifest, duplicate_ids)
+        released.update(duplicate_ids)
+        merged = [rep_id for rep_id, sources in merged_sources.items() if len(sources) > 1]
+        for i in range(0, len(merged), BATCH_SIZE):
+            batch = merged[i:i + BATCH_SIZE]
+            collection.update(
+                ids=batch,
+                metadatas=[
+                    {**rep_metadatas[rep_id], "source": ", ".join(sorted(merged_sources[rep_id]))}
+                    for rep_id in batch
+                ]
+            )
+        stats["duplicates"] += len(duplicate_ids)
+        stats["saved_bytes"] += len(duplicate_ids) * model.get_sentence_embedding_dimension() * 4
+
+    # Tombstone files that disappeared from the docs directory
+    candidates = set(manifest["files"]) if only_keys is None else set(only_keys) & set(manifest["files"])
+    for key in sorted(candidates - seen_files):
+        removed_ids = entry_chunk_ids(manifest["files"][key])
+        delete_chunks(manifest, removed_ids)
+        released.update(removed_ids)
+        for cid in removed_ids:
+            duplicates.pop(cid, None)
+        file_outcomes.pop(key, None)
+        if parent_store is not None:
+            parent_store.remove_document(key)
+        del manifest["files"][key]
+        stats["docs_removed"] += 1
+        print(f"   🗑️ {key}: removed")
+
+    # Duplicates from earlier passes or runs whose representative just changed or
+    # went away: forget their chunk hash and file hash so the next pass re-embeds them
+    orphaned = set()
+    for dup_id, info in list(duplicates.items()):
+        if info["rep"] not in released or dup_id in recorded:
+            continue
+        del duplicates[dup_id]
+        entry = manifest["files"].get(info["file"])
+        if entry is None or info["index"] >= len(entry["chunks"]):
+            continue
+        entry["chunks"][info["index"]] = ""
+        entry["hash"] = ""
+        orphaned.add(info["file"])
+    return orphaned
+
+def sync_documents(manifest, only_keys=None):
+    """
+    Bring techcorp_rag in line with the docs directory and update the manifest.
+
+    only_keys limits the pass to those '<section>/<file>' keys (watch mode);
+    by default every document is checked. Returns the run's counters.
+    """
+    global paragraphs_encoded
+    paragraphs_encoded = 0
+    # Work on a copy: a failed sync must leave the manifest as it was so that a
+    # retry re-embeds the same files instead of seeing them as unchanged
+    working = copy.deepcopy(manifest)
+    try:
+        stats = sync_manifest(working, only_keys)
+    except BaseException:
+        del pending_ids[:], pending_chunks[:], pending_metadatas[:], pending_parts[:]
+        # Vectors written or deleted before the failure are not in the kept sums:
+        # recompute them from the collection on the next sync. The BM25 changes
+        # are kept and applied by the next successful sync.
+        manifest.pop("sections", None)
+        raise
+    manifest.clear()
+    manifest.update(working)
+    return stats
+
+def sync_manifest(manifest, only_keys):
+    """sync_documents on a manifest that is thrown away if this raises"""
+    if not SECTION_CENTROIDS:
+        manifest.pop("sections", None)  # would go stale while not maintained
+    elif "sections" not in manifest or sum(s["count"] for s in manifest["sections"].values()) != collection.count():
+        # First run with running sums, or they no longer describe the collection
+        manifest["sections"] = section_sums(iter_stored_pages(["embeddings", "metadatas"]))
+    stats = {"embedded_chunks": 0, "docs_removed": 0, "duplicates": 0, "saved_bytes": 0}
+    file_outcomes = {}  # key -> (processed?, chunk count); a later pass overrides an earlier one
+
+    # Shared by every pass, so re-synced duplicates collapse onto this run's representatives
+    dedup = {
+        "index": {},      # section -> NearDuplicateIndex of its representatives
+        "metadatas": {},  # representative chunk id -> its own metadata
+        "sources": {}     # representative chunk id -> every source it stands for
+    }
+
+    keys = only_keys
+    while True:
+        orphaned = sync_pass(manifest, keys, stats, file_outcomes, dedup)
+        if not orphaned:
+            break
+        # Their chunks were stored as near-duplicates of chunks that just changed or disappeared
+        print(f"   ♻️ Re-syncing {len(orphaned)} file(s) whose near-duplicate chunks lost their representative")
+        keys = orphaned
+
+    stats["docs_processed"] = sum(1 for processed, _ in file_outcomes.values() if processed)
+    stats["docs_skipped"] = len(file_outcomes) - stats["docs_processed"]
+    stats["total_chunks"] = sum(count for _, count in file_outcomes.values())
+
+    # Only record the new state once every write has succeeded
+    save_manifest(manifest)
+
+    # Derived indexes follow this sync's changes; only a missing index is built from the collection
+    collection_changed = stats["docs_processed"] or stats["docs_removed"]
+    if BM25 and not Bm25Index.exists(BM25_INDEX_PATH):
+        rebuild_bm25_index()
+    elif BM25 and (bm25_upserts or bm25_deleted):
+        update_bm25_index()
+    # Cleared only once applied, so changes of a failed sync reach the index with its retry
+    bm25_upserts.clear()
+    bm25_deleted.clear()
+    if SECTION_CENTROIDS and (collection_changed or not os.path.exists(CENTROIDS_PATH)):
+        write_section_centroids(manifest)
+    if collection_changed and FaqIndex.exists():
+        stale = len(FaqIndex().stale_entries())
+        if stale:
+            print(f"   📚 {stale} FAQ answers now stale: skipped until rag_service.py or "
+                  f"`build_faq_index.py --refresh` rebuilds them")
+    return stats
+
+# Load the manifest of what is already embedded. If the collection was wiped
+# the manifest no longer describes it, so start from scratch.
+manifest = load_manifest()
+if FULL_REBUILD:
+    # Chunks of documents that are gone, or that no longer chunk the same way,
+    # would survive an upsert-only pass, so the collection and its side stores go too
+    print("🧹 Full rebuild: dropping techcorp_rag, the BM25 index, section centroids and parent store")
+    collection_metadata = collection.metadata
+    client.delete_collection("techcorp_rag")
+    collection = client.create_collection("techcorp_rag", metadata=collection_metadata or None)
+    shutil.rmtree(BM25_INDEX_PATH, ignore_errors=True)
+    if os.path.exists(CENTROIDS_PATH):
+        os.remove(CENTROIDS_PATH)
+    if parent_store:
+        parent_store.clear()
+    manifest.pop("sections", None)
+if FULL_REBUILD or collection.count() == 0:
+    manifest["files"] = {}
+    manifest["duplicates"] = {}
+
 # Process documents
-doc_dir = Path("/root/techcorp-docs")
-total_chunks = 0
-docs_processed = 0
-
-for category_dir in doc_dir.iterdir():
-    if category_dir.is_dir():
-        print(f"\n📂 Processing {category_dir.name}:")
-
-        for doc_file in category_dir.glob("*.md"):
-            # TODO 3: Create metadata for document tracking
-            # Hint: Use doc_file.name for source, category_dir.name for section
-            metadata = {
-                "source": doc_file.name,  # Replace ___ with doc_file.name
-                "section": category_dir.name  # Replace ___ with category_dir.name
-            }
-
-            # Read and process document
-            with open(doc_file, "r") as f:
-                content = f.read()
-
-            # Chunk the document
-            chunks = smart_chunk_document(content)
-
-            # Store chunks in vector database
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{category_dir.name}_{doc_file.stem}_chunk_{i}"
-                embedding = model.encode(chunk).tolist()
-
-                collection.add(
-                    ids=[chunk_id],
-                    embeddings=[embedding],
-                    documents=[chunk],
-                    metadatas=[metadata]
-                )
-                total_chunks += 1
-
-            docs_processed += 1
-            print(f"   ✅ {doc_file.name}: {len(chunks)} chunks")
+print(f"\n📂 Processing {doc_dir} with {INGEST_WORKERS} chunking workers:")
+start_time = time.perf_counter()
+try:
+    stats = sync_documents(manifest)
+finally:
+    # The worker processes are only needed for this one sync
+    if embedding_pool is not None:
+        embedding_pool.close()
+docs_processed = stats["docs_processed"]
+total_chunks = stats["total_chunks"]
+embedded_chunks = stats["embedded_chunks"]
+
+elapsed = time.perf_counter() - start_time
+chunks_per_sec = embedded_chunks / elapsed if elapsed > 0 else 0.0
 
 print("\n" + "=" * 50)
 print("🎉 Document Processing Complete!")
 print(f"   - Documents processed: {docs_processed}")
+print(f"   - Documents unchanged (skipped): {stats['docs_skipped']}")
+print(f"   - Documents removed: {stats['docs_removed']}")
 print(f"   - Total chunks created: {total_chunks}")
+print(f"   - Chunks embedded this run: {embedded_chunks}")
 print(f"   - Collection size: {collection.count()}")
+print(f"   - Batch size: {BATCH_SIZE} chunks")
+print(f"   - Throughput: {chunks_per_sec:.1f} chunks/sec ({elapsed:.2f}s)")
+if DEDUP:
+    print(f"   - Near-duplicates collapsed: {stats['duplicates']} embeddings saved "
+          f"(~{stats['saved_bytes'] / 1024:.1f} KiB of index space)")
+if PARAGRAPH_MODE:
+    print(f"   - Paragraph mode: {paragraphs_encoded} paragraphs encoded for {embedded_chunks} chunks")
+if isinstance(model, CachedEncoder):
+    cache_stats = model.cache.stats()
+    print(f"   - Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+          f"{cache_stats['evictions']} evictions")
 print("=" * 50)
 
 # Create marker file
 os.makedirs("/root/markers", exist_ok=True)
 with open("/root/markers/task2_processing_complete.txt", "w") as f:
-    f.write(f"TASK2_COMPLETE:DOCS={docs_processed},CHUNKS={total_chunks}")
+    # Every document now in the collection, not just the ones re-embedded this run
+    f.write(f"TASK2_COMPLETE:DOCS={docs_processed + stats['docs_skipped']},CHUNKS={total_chunks}")
 
 print("\n💡 Smart chunking preserves context for better generation!")
-print("\n✅ Task 2 completed!")
\ No newline at end of file
+print("\n✅ Task 2 completed!")
+
+def sync_changed(keys):
+    """Watch-mode callback: re-sync one debounced micro-batch of changed files"""
+    started = time.perf_counter()
+    print(f"\n🔄 {len(keys)} changed file(s):")
+    batch_stats = sync_documents(manifest, only_keys=keys)
+    print(f"   ⏱️ Synced in {time.perf_counter() - started:.2f}s: "
+          f"{batch_stats['embedded_chunks']} chunks embedded, {batch_stats['docs_removed']} files removed")
+
+# Watch mode: keep techcorp_rag fresh as documents change
+# (python3 task_2_document_processing.py --watch)
+if "--watch" in sys.argv:
+    debounce = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "1.0"))
+    print(f"\n👀 Watching {doc_dir} via {watch_backend()} (Ctrl+C to stop)")
+    try:
+        watch_documents(doc_dir, sync_changed, debounce=debounce)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
\ No newline at end of file
@@ -6,6 +6,7 @@ Build the RAG prompt template that ensures accurate, context-based answers
 
 import os
 from langchain_openai import ChatOpenAI
+from context_packer import ContextPacker
 
 print("📝 Task 4: Prompt Engineering")
 print("=" * 50)
@@ -21,6 +22,14 @@ client = ChatOpenAI(
     max_tokens=200
 )
 
+# Overlapping chunks repeat paragraphs; pack them into a token budget (RAG_CONTEXT_PACKING=0 disables)
+context_packer = None
+if os.getenv("RAG_CONTEXT_PACKING", "1") == "1":
+    context_packer = ContextPacker(
+        token_budget=int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500")),
+        min_shared=int(os.getenv("RAG_CONTEXT_MIN_SHARED_TOKENS", "12"))
+    )
+
 print("✅ OpenAI client ready")
 
 def create_rag_prompt(context_chunks, user_question):
@@ -35,6 +44,12 @@ Be concise and accurate."""  # Replace ___ with "ONLY"
 
     # TODO 2: Build context section from retrieved chunks
     # Hint: Format each chunk as [Document N] followed by content
+    if context_packer is not None:
+        packed = context_packer.pack(context_chunks)
+        print(f"✂️ Context packed: {packed['raw_tokens']} → {packed['tokens']} tokens "
+              f"({packed['tokens_saved']} saved)")
+        context_chunks = packed["chunks"]
+
     context_text = "Context from TechCorp documents:\n\n"
     for i, chunk in enumerate(context_chunks, 1):
         context_text += f"[Document {i}]\n{chunk}\n\n"  # Replace ___ with chunk
@@ -5,9 +5,31 @@ Wire everything together - Retrieve, Augment, Generate!
 """
 
 import os
+import sys
+
+# With RAG_SERVICE_URL set, a running rag_service.py answers instead: nothing
+# below (model, collection, LLM client) has to be loaded by this process
+if __name__ == "__main__" and os.getenv("RAG_SERVICE_URL"):
+    from rag_client import run_remote
+    sys.exit(run_remote(os.environ["RAG_SERVICE_URL"], sys.argv[1:]))
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 import chromadb
-from sentence_transformers import SentenceTransformer
 from langchain_openai import ChatOpenAI
+from embedding_cache import CachedEncoder
+from onnx_encoder import load_encoder, encoder_cache_name
+from confidence_gate import ConfidenceGate, FALLBACK_ANSWER
+from answer_cache import SemanticAnswerCache
+from context_packer import ContextPacker
+from bm25_index import Bm25Index, reciprocal_rank_fusion
+from section_router import SectionRouter, section_filter
+from rag_metrics import RagMetrics, NO_TRACE
+from micro_batcher import MicroBatchEncoder
+from adaptive_k import AdaptiveCutoff
+from parent_store import ParentStore, PARENT_STORE_PATH
+from faq_index import FaqIndex
 
 print("🚀 Task 5: Complete RAG Pipeline")
 print("=" * 50)
@@ -15,7 +37,17 @@ print("=" * 50)
 # Initialize all components
 client_db = chromadb.PersistentClient(path="./chroma_db")
 collection = client_db.get_or_create_collection("techcorp_rag")
-model = SentenceTransformer("all-MiniLM-L6-v2")
+model = load_encoder("all-MiniLM-L6-v2")  # EMBEDDING_BACKEND=onnx-int8 for the quantized encoder
+if os.getenv("EMBEDDING_CACHE", "1") == "1":
+    model = CachedEncoder(model, encoder_cache_name("all-MiniLM-L6-v2"))
+# Concurrent single-question encodes share one forward pass: up to QUERY_BATCH_MAX
+# questions gathered for at most QUERY_BATCH_WAIT_MS (QUERY_MICRO_BATCHING=0 disables)
+if os.getenv("QUERY_MICRO_BATCHING", "1") == "1":
+    model = MicroBatchEncoder(
+        model,
+        max_batch=int(os.getenv("QUERY_BATCH_MAX", "32")),
+        max_wait_ms=float(os.getenv("QUERY_BATCH_WAIT_MS", "3"))
+    )
 
 api_base = os.getenv("OPENAI_API_BASE")
 api_key = os.getenv("OPENAI_API_KEY")
@@ -27,34 +59,102 @@ client_llm = ChatOpenAI(
     max_tokens=500
 )
 
-print("✅ All components loaded")
+# Concurrent LLM calls allowed by rag_pipeline_batch
+RAG_BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+# Bounded thread pool for the blocking encode/query steps of rag_pipeline_async
+RAG_IO_THREADS = int(os.getenv("RAG_IO_THREADS", "4"))
+blocking_pool = ThreadPoolExecutor(max_workers=RAG_IO_THREADS, thread_name_prefix="rag-retrieve")
 
-def rag_pipeline(user_question):
-    """Complete RAG pipeline: Retrieve → Augment → Generate"""
+# Skip the LLM when the best chunk is too dissimilar to the question, unless its best BM25
+# hit matched at least RAG_MIN_LEXICAL of it in hybrid mode
+# (run calibrate_confidence.py to pick RAG_MIN_SIMILARITY; RAG_CONFIDENCE_GATE=0 disables)
+confidence_gate = None
+if os.getenv("RAG_CONFIDENCE_GATE", "1") == "1":
+    confidence_gate = ConfidenceGate(
+        min_similarity=float(os.getenv("RAG_MIN_SIMILARITY", "0.3")),
+        min_gap=float(os.getenv("RAG_MIN_SCORE_GAP", "0")),
+        space=(collection.metadata or {}).get("hnsw:space", "l2"),
+        min_lexical=float(os.getenv("RAG_MIN_LEXICAL", "0.75"))
+    )
 
-    print(f"\n📝 Question: '{user_question}'")
-    print("-" * 50)
+# Reuse answers for reworded questions that retrieve the same chunks (ANSWER_CACHE=0 disables);
+# entries expire, are evicted beyond ANSWER_CACHE_SIZE and drop out when their chunks are re-ingested
+answer_cache = None
+if os.getenv("ANSWER_CACHE", "1") == "1":
+    answer_cache = SemanticAnswerCache(
+        min_similarity=float(os.getenv("ANSWER_CACHE_MIN_SIMILARITY", "0.92")),
+        ttl=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400")),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1000")),
+        dim=model.get_sentence_embedding_dimension()
+    )
 
-    # Step 1: RETRIEVE
-    print("1️⃣ RETRIEVE: Converting to embedding...")
-    query_embedding = model.encode(user_question).tolist()
+# Drop paragraphs repeated across overlapping chunks and keep the context within
+# RAG_CONTEXT_TOKEN_BUDGET tokens (RAG_CONTEXT_PACKING=0 disables)
+context_packer = None
+if os.getenv("RAG_CONTEXT_PACKING", "1") == "1":
+    context_packer = ContextPacker(
+        token_budget=int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500")),
+        min_shared=int(os.getenv("RAG_CONTEXT_MIN_SHARED_TOKENS", "12"))
+    )
 
-    # TODO 1: Perform semantic search to find relevant chunks
-    # Hint: Use collection.query(query_embeddings=[...], n_results=3)
-    results = collection.query(
-        query_embeddings=[query_embedding],  # Replace ___ with query_embedding
-        n_results=3  # Replace ___ with 3
+# Hybrid retrieval: dense candidates fused with BM25 hits from Task 2's ./bm25_index by
+# reciprocal-rank fusion (RAG_HYBRID=0, or no index yet, means dense search only)
+RAG_TOP_K = 3
+RAG_HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "10"))
+bm25 = None
+if os.getenv("RAG_HYBRID", "1") == "1" and Bm25Index.exists():
+    bm25 = Bm25Index()
+
+# Adaptive k: over-fetch RAG_MAX_K hits and keep RAG_MIN_K..RAG_MAX_K of them, cut at the
+# largest score gap ("gap") or a cumulative-similarity threshold ("cumulative");
+# RAG_ADAPTIVE_K=off always uses 3. Each decision goes to the request log.
+adaptive_cutoff = None
+if os.getenv("RAG_ADAPTIVE_K", "gap") != "off":
+    adaptive_cutoff = AdaptiveCutoff(
+        mode=os.getenv("RAG_ADAPTIVE_K", "gap"),
+        min_k=int(os.getenv("RAG_MIN_K", "1")),
+        max_k=int(os.getenv("RAG_MAX_K", "5")),
+        default_k=RAG_TOP_K,
+        min_gap=float(os.getenv("RAG_ADAPTIVE_MIN_GAP", "0.05")),
+        threshold=float(os.getenv("RAG_ADAPTIVE_THRESHOLD", "0.6")),
+        space=(collection.metadata or {}).get("hnsw:space", "l2")
     )
 
-    retrieved_chunks = results['documents'][0]
-    metadatas = results['metadatas'][0]
+# Parent/child retrieval: hits from the same file are merged into one contiguous span of
+# the paragraphs Task 2 stored in ./parent_store.sqlite (RAG_PARENT_MERGE=0 disables)
+parent_store = None
+if os.getenv("RAG_PARENT_MERGE", "1") == "1" and os.path.exists(PARENT_STORE_PATH):
+    parent_store = ParentStore(PARENT_STORE_PATH)
 
-    print(f"   ✅ Retrieved {len(retrieved_chunks)} relevant chunks")
-    for i, meta in enumerate(metadatas):
-        print(f"      - {meta['source']} ({meta['section']})")
+# Precomputed answers for frequent questions (build_faq_index.py): a question within
+# RAG_FAQ_MIN_SIMILARITY of one is answered before retrieval; entries whose chunks were
+# re-ingested are skipped until rebuilt (RAG_FAQ=0 disables)
+faq_index = None
+if os.getenv("RAG_FAQ", "1") == "1" and FaqIndex.exists():
+    faq_index = FaqIndex(min_similarity=float(os.getenv("RAG_FAQ_MIN_SIMILARITY", "0.95")))
 
-    # Step 2: AUGMENT
-    print("\n2️⃣ AUGMENT: Building context...")
+# Section routing: only search the RAG_ROUTE_SECTIONS sections whose centroid (written by
+# Task 2) is closest to the question, via a `where` filter. Opt-in (RAG_SECTION_ROUTING=1):
+# with the lab's three sections a question routed away from its section gets no answer.
+section_router = None
+if os.getenv("RAG_SECTION_ROUTING", "0") == "1" and SectionRouter.exists():
+    section_router = SectionRouter(top_m=int(os.getenv("RAG_ROUTE_SECTIONS", "2")))
+
+# Per-stage timings and LLM token counts are always aggregated in memory; --profile
+# prints p50/p95/p99 per stage after a run. Files are opt-in (RAG_METRICS=1, or
+# --profile): every request, question included, is appended to RAG_METRICS_LOG (JSONL)
+# and aggregates go to RAG_METRICS_PROM (Prometheus text) at exit.
+PROFILE = __name__ == "__main__" and "--profile" in sys.argv
+METRICS_EXPORT = PROFILE or os.getenv("RAG_METRICS", "0") == "1"
+metrics = RagMetrics(
+    jsonl_path=(os.getenv("RAG_METRICS_LOG", "./rag_requests.jsonl") or None) if METRICS_EXPORT else None,
+    prometheus_path=(os.getenv("RAG_METRICS_PROM", "./rag_metrics.prom") or None) if METRICS_EXPORT else None
+)
+
+print("✅ All components loaded")
+
+def build_rag_messages(retrieved_chunks, user_question):
+    """Augment: system prompt plus retrieved context and question as chat messages"""
 
     # TODO 2: Define system prompt for context-aware answers
     # Hint: Already complete - review the prompt below
@@ -70,11 +170,6 @@ If the answer is not in the context, say: 'I don't have that information in the
     # Hint: Add user_question after "Question:"
     user_prompt = f"{context_text}\nQuestion: {user_question}\n\nAnswer:"  # Replace ___ with user_question
 
-    print("   ✅ Context prepared with retrieved documents")
-
-    # Step 3: GENERATE
-    print("\n3️⃣ GENERATE: Creating answer...")
-
     # TODO 4: Create messages for LLM with system and user prompts
     # Hint: Use system_prompt and user_prompt
     messages = [
@@ -82,8 +177,10 @@ If the answer is not in the context, say: 'I don't have that information in the
         {"role": "user", "content": user_prompt}     # Replace ___ with user_prompt
     ]
 
-    response = client_llm.invoke(messages)
-    answer = response.content
+    return messages
+
+def format_final_response(answer, metadatas):
+    """Append source citations to a generated answer"""
 
     # TODO 5: Format response with source citations
     # Hint: Use ', '.join(unique_sources) to list sources
@@ -94,6 +191,492 @@ If the answer is not in the context, say: 'I don't have that information in the
 
     return final_response
 
+def dense_n_results():
+    """Dense hits to fetch: the final top 3, or more to cut adaptively or fuse with BM25"""
+    n_results = RAG_TOP_K if adaptive_cutoff is None else adaptive_cutoff.max_k
+    return n_results if bm25 is None else max(n_results, RAG_HYBRID_CANDIDATES)
+
+def choose_k(distances):
+    """(hits to keep, reason) for a question, from its dense distances (best first); reason is None for the fixed 3"""
+    if adaptive_cutoff is None:
+        return RAG_TOP_K, None
+    return adaptive_cutoff.choose(distances)
+
+def keep_hits(user_question, chunk_ids, chunks, metadatas, k, where=None, trace=NO_TRACE):
+    """
+    The k hits a question keeps from its dense results: (chunks, metadatas,
+    ids, lexical). With adaptive k, dense hits past the cut stay out of the
+    BM25 fusion as well, so a hit the cutoff rejected can't rank back in.
+    """
+    if adaptive_cutoff is not None:
+        chunk_ids, chunks, metadatas = chunk_ids[:k], chunks[:k], metadatas[:k]
+    if bm25 is None or not user_question:
+        return chunks[:k], metadatas[:k], chunk_ids[:k], None
+    return hybrid_fuse(user_question, chunk_ids, chunks, metadatas, where, trace, k)
+
+def route_filter(query_embedding, trace=NO_TRACE):
+    """Chroma `where` filter for the question's sections, or None to search everything"""
+    if section_router is None:
+        return None
+    section_router.reload_if_changed()
+    sections = section_router.route(query_embedding)
+    if not sections:
+        return None
+    trace.note("sections", sections)
+    return section_filter(sections)
+
+def hybrid_fuse(user_question, dense_ids, dense_chunks, dense_metadatas, where=None, trace=NO_TRACE, k=RAG_TOP_K):
+    """
+    Reciprocal-rank fusion of dense and BM25 rankings: top (chunks,
+    metadatas, ids) and the match strength of the best BM25 hit that passed
+    the section filter (0.0 if none did)
+    """
+    with trace.span("bm25"):
+        bm25.reload_if_changed()
+        lexical_hits = bm25.search(user_question, k=RAG_HYBRID_CANDIDATES)
+    lexical_ids = [cid for cid, _ in lexical_hits]
+
+    known = dict(zip(dense_ids, zip(dense_chunks, dense_metadatas)))
+    missing = [cid for cid in lexical_ids if cid not in known]
+    if missing:
+        with trace.span("query"):
+            lexical = collection.get(ids=missing, where=where, include=["documents", "metadatas"])
+        # Same section filter as the dense search; also drops chunks a running sync just deleted
+        known.update(zip(lexical['ids'], zip(lexical['documents'], lexical['metadatas'])))
+    lexical_ids = [cid for cid in lexical_ids if cid in known]
+    best = next((score for cid, score in lexical_hits if cid in known), 0.0)
+
+    fused = reciprocal_rank_fusion([dense_ids, lexical_ids])[:k]
+    strength = bm25.match_strength(user_question, best)
+    return [known[cid][0] for cid in fused], [known[cid][1] for cid in fused], fused, strength
+
+def retrieve(query_embedding, user_question=None, trace=NO_TRACE):
+    """
+    Search for one question: (chunks, metadatas, distances, ids, lexical).
+    distances are the dense scores of the top 3 vector hits, also in hybrid
+    mode and whatever k choose_k() keeps, so the confidence gate always sees
+    the same window; lexical is hybrid_fuse()'s BM25 match strength, or None
+    in dense-only mode.
+    """
+
+    with trace.span("route"):
+        where = route_filter(query_embedding, trace)
+
+    # TODO 1: Perform semantic search to find relevant chunks
+    # Hint: Use collection.query(query_embeddings=[...], n_results=...)
+    # With RAG_ADAPTIVE_K=off and RAG_HYBRID=0 dense_n_results() is the fixed 3; otherwise it
+    # over-fetches candidates that choose_k() cuts and hybrid_fuse() merges with BM25 hits
+    with trace.span("query"):
+        results = collection.query(
+            query_embeddings=[query_embedding],  # Replace ___ with query_embedding
+            n_results=dense_n_results(),  # 3, or the candidates to cut and fuse
+            where=where
+        )
+
+    retrieved_chunks = results['documents'][0]
+    metadatas = results['metadatas'][0]
+    distances = results['distances'][0]
+    chunk_ids = results['ids'][0]
+
+    k, reason = choose_k(distances)
+    if reason is not None:
+        trace.note("k", k)
+        trace.note("k_reason", reason)
+    retrieved_chunks, metadatas, chunk_ids, lexical = keep_hits(
+        user_question, chunk_ids, retrieved_chunks, metadatas, k, where, trace
+    )
+
+    return retrieved_chunks, metadatas, distances[:RAG_TOP_K], chunk_ids, lexical
+
+def retrieve_many(questions, query_embeddings, trace=NO_TRACE):
+    """
+    retrieve() for many questions: one multi-vector collection.query per
+    distinct section route. Returns (chunks, metadatas, distances, ids, lexical) per question.
+    """
+    with trace.span("route"):
+        wheres = [route_filter(embedding) for embedding in query_embeddings]
+    groups = {}
+    for i, where in enumerate(wheres):
+        groups.setdefault(repr(where), []).append(i)
+
+    hits = [None] * len(questions)
+    ks, reasons = [None] * len(questions), [None] * len(questions)
+    for indexes in groups.values():
+        where = wheres[indexes[0]]
+        with trace.span("query"):
+            results = collection.query(
+                query_embeddings=[query_embeddings[i] for i in indexes],
+                n_results=dense_n_results(),
+                where=where
+            )
+        for j, i in enumerate(indexes):
+            ks[i], reasons[i] = choose_k(results['distances'][j])
+            chunks, metadatas, chunk_ids, lexical = keep_hits(
+                questions[i], results['ids'][j], results['documents'][j], results['metadatas'][j],
+                ks[i], where, trace
+            )
+            hits[i] = (chunks, metadatas, results['distances'][j][:RAG_TOP_K], chunk_ids, lexical)
+
+    # One trace covers the whole batch: note every question's decision, in order
+    if adaptive_cutoff is not None:
+        trace.note("k", ks)
+        trace.note("k_reason", reasons)
+    return hits
+
+def low_confidence(distances, lexical=None):
+    """True when the confidence gate says the LLM call should be skipped"""
+    if confidence_gate is None:
+        return False
+    passed, _ = confidence_gate.check(distances, lexical)
+    return not passed
+
+def pack_context(retrieved_chunks, chunk_ids):
+    """
+    Prompt-ready context: hits merged into parent spans, then packed into the
+    token budget. Returns (texts, packer report or None when packing is off).
+    """
+    if parent_store is not None:
+        retrieved_chunks, _ = parent_store.merge_hits(chunk_ids, retrieved_chunks)
+    if context_packer is None:
+        return retrieved_chunks, None
+    packed = context_packer.pack(retrieved_chunks)
+    return packed["chunks"], packed
+
+def faq_answer(query_embedding):
+    """Precomputed answer for a frequent question, or None"""
+    if faq_index is None:
+        return None
+    faq_index.reload_if_changed()
+    entry = faq_index.lookup(query_embedding)
+    return entry["answer"] if entry is not None else None
+
+def cached_answer(query_embedding, chunk_ids):
+    """Answer cached for an equivalent question, or None"""
+    if answer_cache is None:
+        return None
+    return answer_cache.lookup(query_embedding, chunk_ids)
+
+def cache_answer(query_embedding, chunk_ids, answer):
+    if answer_cache is not None:
+        answer_cache.store(query_embedding, chunk_ids, answer)
+
+def rag_pipeline(user_question):
+    """Complete RAG pipeline: Retrieve → Augment → Generate"""
+    trace = metrics.trace(user_question)
+    answer, outcome = run_rag_pipeline(user_question, trace)
+    trace.finish(outcome)
+    return answer
+
+def run_rag_pipeline(user_question, trace):
+    """rag_pipeline's stages, timed on trace: (answer, outcome)"""
+
+    print(f"\n📝 Question: '{user_question}'")
+    print("-" * 50)
+
+    # Step 1: RETRIEVE
+    print("1️⃣ RETRIEVE: Converting to embedding...")
+    with trace.span("encode"):
+        query_embedding = model.encode(user_question).tolist()
+
+    with trace.span("faq"):
+        precomputed = faq_answer(query_embedding)
+    if precomputed is not None:
+        print("   📚 FAQ index hit - precomputed answer, skipping retrieval and the LLM call")
+        return precomputed, "faq"
+
+    retrieved_chunks, metadatas, distances, chunk_ids, lexical = retrieve(query_embedding, user_question, trace)
+
+    if "sections" in trace.notes:
+        print(f"   🧭 Searched sections: {', '.join(trace.notes['sections'])}")
+    if "k_reason" in trace.notes:
+        print(f"   📏 Adaptive k={trace.notes['k']}: {trace.notes['k_reason']}")
+    print(f"   ✅ Retrieved {len(retrieved_chunks)} relevant chunks")
+    for i, meta in enumerate(metadatas):
+        print(f"      - {meta['source']} ({meta['section']})")
+
+    if low_confidence(distances, lexical):
+        print(f"   ⛔ Low retrieval confidence - answering without the LLM "
+              f"({confidence_gate.llm_calls_avoided} LLM calls avoided so far)")
+        return FALLBACK_ANSWER, "fallback"
+
+    with trace.span("cache"):
+        cached = cached_answer(query_embedding, chunk_ids)
+    if cached is not None:
+        print("   ⚡ Answer cache hit - same chunks as an earlier question, skipping the LLM call")
+        return cached, "cache"
+
+    # Step 2: AUGMENT
+    print("\n2️⃣ AUGMENT: Building context...")
+
+    with trace.span("assemble"):
+        context_chunks, packed = pack_context(retrieved_chunks, chunk_ids)
+        messages = build_rag_messages(context_chunks, user_question)
+
+    print(f"   ✅ Context prepared from {len(context_chunks)} passages "
+          f"({len(retrieved_chunks)} hits, adjacent hits merged)" if parent_store is not None
+          else "   ✅ Context prepared with retrieved documents")
+    if packed is not None:
+        print(f"   ✂️ Context packed: {packed['raw_tokens']} → {packed['tokens']} tokens "
+              f"({packed['tokens_saved']} saved)")
+
+    # Step 3: GENERATE
+    print("\n3️⃣ GENERATE: Creating answer...")
+
+    with trace.span("llm"):
+        response = client_llm.invoke(messages)
+    trace.record_usage(response)
+    answer = response.content
+
+    final_response = format_final_response(answer, metadatas)
+    cache_answer(query_embedding, chunk_ids, final_response)
+    return final_response, "llm"
+
+def rag_pipeline_batch(questions, max_concurrency=RAG_BATCH_CONCURRENCY):
+    """
+    Batch RAG for evaluation sets and bulk FAQ generation: one encode for all
+    questions, one multi-vector collection.query per section route and up to
+    max_concurrency concurrent LLM calls. Answers come back in question order.
+    """
+    # Batches are traced as one request (question None) so the log only holds live traffic
+    trace = metrics.trace(None)
+    results, _ = run_rag_pipeline_batch(questions, trace, max_concurrency)
+    trace.finish("batch")
+    return [answer for answer, _, _ in results]
+
+def run_rag_pipeline_batch(questions, trace, max_concurrency=RAG_BATCH_CONCURRENCY):
+    """
+    rag_pipeline_batch's stages, timed on trace. Returns ([(answer, outcome,
+    chunk ids)] in question order, question embeddings).
+    """
+    questions = list(questions)
+    if not questions:
+        return [], []
+
+    # Step 1: RETRIEVE all questions at once
+    with trace.span("encode"):
+        query_embeddings = model.encode(questions).tolist()
+    hits = retrieve_many(questions, query_embeddings, trace)
+
+    results = [(FALLBACK_ANSWER, "fallback", hit[3]) for hit in hits]
+    pending = []
+    for i, (_, _, distances, chunk_ids, lexical) in enumerate(hits):
+        if low_confidence(distances, lexical):
+            continue
+        with trace.span("cache"):
+            cached = cached_answer(query_embeddings[i], chunk_ids)
+        if cached is not None:
+            results[i] = (cached, "cache", chunk_ids)
+        else:
+            pending.append(i)
+
+    # Step 2: AUGMENT
+    with trace.span("assemble"):
+        message_batches = [
+            build_rag_messages(pack_context(hits[i][0], hits[i][3])[0], questions[i]) for i in pending
+        ]
+
+    # Step 3: GENERATE concurrently; batch() keeps input order
+    with trace.span("llm"):
+        responses = client_llm.batch(message_batches, config={"max_concurrency": max_concurrency})
+
+    for i, response in zip(pending, responses):
+        trace.record_usage(response)
+        answer = format_final_response(response.content, hits[i][1])
+        results[i] = (answer, "llm", hits[i][3])
+        cache_answer(query_embeddings[i], hits[i][3], answer)
+
+    return results, query_embeddings
+
+async def encode_question(user_question):
+    """Query embedding without blocking the event loop (awaits the micro-batcher directly)"""
+    if isinstance(model, MicroBatchEncoder):
+        return (await asyncio.wrap_future(model.submit(user_question))).tolist()
+    loop = asyncio.get_running_loop()
+    return (await loop.run_in_executor(blocking_pool, model.encode, user_question)).tolist()
+
+async def rag_pipeline_async(user_question):
+    """
+    asyncio RAG pipeline: embedding is awaited from the micro-batcher, Chroma
+    search runs on the bounded blocking_pool and generation awaits
+    ChatOpenAI.ainvoke, so one event loop serves many concurrent questions.
+    """
+    trace = metrics.trace(user_question)
+    answer, outcome = await run_rag_pipeline_async(user_question, trace)
+    trace.finish(outcome)
+    return answer
+
+async def run_rag_pipeline_async(user_question, trace):
+    """rag_pipeline_async's stages, timed on trace: (answer, outcome)"""
+    loop = asyncio.get_running_loop()
+    with trace.span("encode"):
+        query_embedding = await encode_question(user_question)
+    with trace.span("faq"):
+        precomputed = faq_answer(query_embedding)
+    if precomputed is not None:
+        return precomputed, "faq"
+    with trace.span("retrieve_wait"):
+        retrieved_chunks, metadatas, distances, chunk_ids, lexical = await loop.run_in_executor(
+            blocking_pool, retrieve, query_embedding, user_question, trace
+        )
+    if low_confidence(distances, lexical):
+        return FALLBACK_ANSWER, "fallback"
+
+    with trace.span("cache"):
+        cached = cached_answer(query_embedding, chunk_ids)
+    if cached is not None:
+        return cached, "cache"
+
+    with trace.span("assemble"):
+        messages = build_rag_messages(pack_context(retrieved_chunks, chunk_ids)[0], user_question)
+    with trace.span("llm"):
+        response = await client_llm.ainvoke(messages)
+    trace.record_usage(response)
+
+    final_response = format_final_response(response.content, metadatas)
+    cache_answer(query_embedding, chunk_ids, final_response)
+    return final_response, "llm"
+
+def _count_streamed_tokens(final_chunk, content_chunks):
+    """Output tokens of a streamed answer: usage metadata if sent, else one per content chunk"""
+    usage = getattr(final_chunk, "usage_metadata", None) if final_chunk is not None else None
+    return usage["output_tokens"] if usage and usage.get("output_tokens") else content_chunks
+
+def rag_pipeline_stream(user_question):
+    """
+    Streaming RAG pipeline: yields answer text as the LLM produces it and the
+    📎 Sources footer last. Time-to-first-token and tokens/sec are recorded
+    on the request's trace.
+    """
+    trace = metrics.trace(user_question)
+    outcome = "llm"
+    try:
+        with trace.span("encode"):
+            query_embedding = model.encode(user_question).tolist()
+        with trace.span("faq"):
+            precomputed = faq_answer(query_embedding)
+        if precomputed is not None:
+            outcome = "faq"
+            yield precomputed
+            return
+
+        retrieved_chunks, metadatas, distances, chunk_ids, lexical = retrieve(query_embedding, user_question, trace)
+
+        if low_confidence(distances, lexical):
+            outcome = "fallback"
+            yield FALLBACK_ANSWER
+            return
+
+        with trace.span("cache"):
+            cached = cached_answer(query_embedding, chunk_ids)
+        if cached is not None:
+            outcome = "cache"
+            yield cached
+            return
+
+        with trace.span("assemble"):
+            messages = build_rag_messages(pack_context(retrieved_chunks, chunk_ids)[0], user_question)
+
+        parts, final_chunk, first_token_at = [], None, None
+        with trace.span("llm"):
+            for chunk in client_llm.stream(messages):
+                final_chunk = chunk if final_chunk is None else final_chunk + chunk
+                if chunk.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    parts.append(chunk.content)
+                    yield chunk.content
+        if first_token_at is not None:
+            trace.record_stream(first_token_at, _count_streamed_tokens(final_chunk, len(parts)), time.perf_counter())
+        if final_chunk is not None:
+            trace.record_usage(final_chunk)
+
+        yield format_final_response("", metadatas)
+        cache_answer(query_embedding, chunk_ids, format_final_response("".join(parts), metadatas))
+    finally:
+        trace.finish(outcome)
+
+async def rag_pipeline_astream(user_question):
+    """asyncio version of rag_pipeline_stream (async generator over ChatOpenAI.astream)"""
+    trace = metrics.trace(user_question)
+    outcome = "llm"
+    try:
+        loop = asyncio.get_running_loop()
+        with trace.span("encode"):
+            query_embedding = await encode_question(user_question)
+        with trace.span("faq"):
+            precomputed = faq_answer(query_embedding)
+        if precomputed is not None:
+            outcome = "faq"
+            yield precomputed
+            return
+
+        with trace.span("retrieve_wait"):
+            retrieved_chunks, metadatas, distances, chunk_ids, lexical = await loop.run_in_executor(
+                blocking_pool, retrieve, query_embedding, user_question, trace
+            )
+
+        if low_confidence(distances, lexical):
+            outcome = "fallback"
+            yield FALLBACK_ANSWER
+            return
+
+        with trace.span("cache"):
+            cached = cached_answer(query_embedding, chunk_ids)
+        if cached is not None:
+            outcome = "cache"
+            yield cached
+            return
+
+        with trace.span("assemble"):
+            messages = build_rag_messages(pack_context(retrieved_chunks, chunk_ids)[0], user_question)
+
+        parts, final_chunk, first_token_at = [], None, None
+        with trace.span("llm"):
+            async for chunk in client_llm.astream(messages):
+                final_chunk = chunk if final_chunk is None else final_chunk + chunk
+                if chunk.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    parts.append(chunk.content)
+                    yield chunk.content
+        if first_token_at is not None:
+            trace.record_stream(first_token_at, _count_streamed_tokens(final_chunk, len(parts)), time.perf_counter())
+        if final_chunk is not None:
+            trace.record_usage(final_chunk)
+
+        yield format_final_response("", metadatas)
+        cache_answer(query_embedding, chunk_ids, format_final_response("".join(parts), metadatas))
+    finally:
+        trace.finish(outcome)
+
+def run_stream_demo():
+    """Stream the test questions' answers to the terminal as they are generated"""
+    for question in ["Can I bring my dog to the office?", "How many vacation days do I get?"]:
+        print("\n" + "=" * 50)
+        print(f"📝 {question}")
+        print("💬 ANSWER:")
+        started = time.perf_counter()
+        first = None
+        for text in rag_pipeline_stream(question):
+            if first is None:
+                first = time.perf_counter() - started
+            print(text, end="", flush=True)
+        print(f"\n⏱️ First token after {first:.2f}s, complete after {time.perf_counter() - started:.2f}s")
+        print("=" * 50)
+
+def run_batch_file(path):
+    """Answer every non-empty line of a questions file with rag_pipeline_batch"""
+    with open(path, "r") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    print(f"\n📦 Batch mode: {len(questions)} questions (concurrency {RAG_BATCH_CONCURRENCY})")
+    for question, answer in zip(questions, rag_pipeline_batch(questions)):
+        print("\n" + "=" * 50)
+        print(f"📝 {question}")
+        print("💬 ANSWER:")
+        print(answer)
+        print("=" * 50)
+
 # Test the complete pipeline
 def test_rag_pipeline():
     """Test with sample questions"""
@@ -111,30 +694,77 @@ def test_rag_pipeline():
         print(answer)
         print("=" * 50)
 
-# Run the test
-try:
-    # First ensure we have documents in the database
-    if collection.count() == 0:
-        print("\n⚠️ No documents in database. Please run Task 2 first!")
-    else:
-        print(f"\n📚 Database has {collection.count()} chunks ready")
-        test_rag_pipeline()
+    if confidence_gate is not None:
+        print(f"\n💸 Confidence gate: {confidence_gate.llm_calls_avoided} of "
+              f"{confidence_gate.checked} LLM calls avoided, "
+              f"{confidence_gate.lexical_passes} passed on a BM25 match")
+    if faq_index is not None:
+        stats = faq_index.stats()
+        print(f"📚 FAQ index: {stats['hits']} of {stats['hits'] + stats['misses']} questions served "
+              f"from {stats['entries']} precomputed answers ({stats['stale_skips']} stale entries skipped)")
+    if answer_cache is not None:
+        stats = answer_cache.stats()
+        print(f"⚡ Answer cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['entries']} entries ({stats['invalidations']} invalidated by re-ingestion)")
+    if adaptive_cutoff is not None:
+        stats = adaptive_cutoff.stats()
+        chosen = ", ".join(f"k={k}: {n}" for k, n in stats['chosen'].items())
+        print(f"📏 Adaptive k: mean {stats['mean_k']:.2f} chunks per question ({chosen})")
+    if isinstance(model, MicroBatchEncoder):
+        stats = model.stats()
+        print(f"📦 Query micro-batching: {stats['items']} encodes in {stats['batches']} batches "
+              f"(mean {stats['mean_batch_size']:.1f}, max {stats['max_batch_size']})")
+    if context_packer is not None:
+        stats = context_packer.stats()
+        print(f"✂️ Context packing: {stats['tokens_saved']} of {stats['raw_tokens']} "
+              f"context tokens saved ({stats['saved_ratio']:.0%}), "
+              f"{stats['paragraphs_dropped']} repeated paragraphs and {stats['runs_dropped']} shared runs dropped")
 
-        print("\n" + "=" * 50)
-        print("🎉 RAG Pipeline Complete!")
-        print("   - Retrieval: Semantic search working")
-        print("   - Augmentation: Context injection ready")
-        print("   - Generation: LLM producing answers")
-        print("   - Citations: Sources included")
-        print("=" * 50)
+def print_profile():
+    """Per-stage latency percentiles of this run (--profile)"""
+    print("\n⏱️ Per-stage latency")
+    print("=" * 59)
+    print(metrics.report())
+    print("=" * 59)
+
+# Run the test (other scripts import this module for its pipeline functions);
+# --profile adds the latency breakdown to any of the three runs
+if __name__ == "__main__" and "--batch" in sys.argv:
+    # python3 task_5_complete_rag.py --batch questions.txt
+    run_batch_file(sys.argv[sys.argv.index("--batch") + 1])
+    if PROFILE:
+        print_profile()
+elif __name__ == "__main__" and "--stream" in sys.argv:
+    # python3 task_5_complete_rag.py --stream
+    run_stream_demo()
+    if PROFILE:
+        print_profile()
+elif __name__ == "__main__":
+    try:
+        # First ensure we have documents in the database
+        if collection.count() == 0:
+            print("\n⚠️ No documents in database. Please run Task 2 first!")
+        else:
+            print(f"\n📚 Database has {collection.count()} chunks ready")
+            test_rag_pipeline()
+
+            print("\n" + "=" * 50)
+            print("🎉 RAG Pipeline Complete!")
+            print("   - Retrieval: Semantic search working")
+            print("   - Augmentation: Context injection ready")
+            print("   - Generation: LLM producing answers")
+            print("   - Citations: Sources included")
+            print("=" * 50)
 
-        # Create marker file
-        os.makedirs("/root/markers", exist_ok=True)
-        with open("/root/markers/task5_rag_complete.txt", "w") as f:
-            f.write("TASK5_COMPLETE:RAG_PIPELINE_READY")
+            # Create marker file
+            os.makedirs("/root/markers", exist_ok=True)
+            with open("/root/markers/task5_rag_complete.txt", "w") as f:
+                f.write("TASK5_COMPLETE:RAG_PIPELINE_READY")
 
-except Exception as e:
-    print(f"\n❌ Error: {e}")
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
 
-print("\n🎯 You've built a complete RAG system - from search to answers!")
-print("\n✅ Task 5 completed!")
\ No newline at end of file
+    if PROFILE:
+        print_profile()
+    print("\n🎯 You've built a complete RAG system - from search to answers!")
+    print("\n✅ Task 5 completed!")